@@ -0,0 +1,137 @@
+# Source\benchmark.py
+"""Headless benchmark for the search algorithms (no pygame display needed)."""
+import csv
+import json
+import os
+import random
+import sys
+import numpy as np
+from maze import Maze
+from instrumentation import profiler, COUNTERS, MEMORY
+from grid_search import BACKENDS, engine_of
+from search_algorithms import path_cache
+
+FIELDS = [
+    "size", "maze", "seed", "terrain", "backend", "algorithm", "searches", "found",
+    "searches_per_sec", "p50_ms", "p90_ms", "p99_ms", "max_ms",
+    "mean_expanded", "mean_frontier_peak", "mean_visited", "cache_hit_rate", "peak_memory_kb",
+]
+
+
+def random_queries(maze, count, seed):
+    """`count` (start, goal) pairs of open cells, reproducible from `seed`"""
+    rng = random.Random(seed)
+    return [(maze.find_random_empty(rng), maze.find_random_empty(rng)) for _ in range(count)]
+
+
+def run_searches(search, maze, queries, cached=False):
+    """Run every query once and return the SearchRecords it produced"""
+    records = []
+    for start, goal in queries:
+        if cached:
+            path_cache.search(search, maze, start, goal)
+        else:
+            search(maze, start, goal)
+        records.append(profiler.last())
+    return records
+
+
+def peak_memory(search, maze, queries):
+    """Largest tracemalloc peak (KB) over the queries; slow, so measured in its own pass"""
+    previous = profiler.mode
+    profiler.set_mode(MEMORY)
+    try:
+        return max(search(maze, start, goal)[3] for start, goal in queries)
+    finally:
+        profiler.set_mode(previous)
+
+
+def summarize(records):
+    latencies = np.array([r.wall_ns for r in records]) / 1e6
+    total_seconds = latencies.sum() / 1e3
+    return {
+        "searches": len(records),
+        "found": sum(1 for r in records if r.path_length),
+        "searches_per_sec": round(len(records) / total_seconds, 2) if total_seconds else 0.0,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+        "p90_ms": round(float(np.percentile(latencies, 90)), 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+        "max_ms": round(float(latencies.max()), 4),
+        "mean_expanded": round(float(np.mean([r.expanded_nodes for r in records])), 2),
+        "mean_frontier_peak": round(float(np.mean([r.frontier_peak for r in records])), 2),
+        "mean_visited": round(float(np.mean([r.visited_count for r in records])), 2),
+        "cache_hit_rate": round(sum(1 for r in records if r.cached) / len(records), 4),
+    }
+
+
+def generate_mazes(sizes, mazes=1, seed=0, save_dir=None, terrain=False):
+    """Yield (size, maze_number, seed, Maze) for maze i of each size seeded with seed + i"""
+    for size in sizes:
+        for maze_number in range(mazes):
+            maze_seed = seed + maze_number
+            maze = Maze(size, size, vectorized=True, seed=maze_seed, terrain=terrain)
+            if save_dir:
+                os.makedirs(save_dir, exist_ok=True)
+                maze.save(os.path.join(save_dir, f"maze_{size}_{maze_seed}.pmaz"))
+            yield size, maze_number, maze_seed, maze
+
+
+def load_mazes(paths):
+    """Yield the same tuples as generate_mazes() for mazes saved with Maze.save"""
+    for maze_number, path in enumerate(paths):
+        maze = Maze.load(path)
+        yield max(maze.width, maze.height), maze_number, maze.seed, maze
+
+
+def run_benchmark(sizes, mazes=1, queries=100, seed=0, algorithms=None, backends=("dict",), memory=False,
+                  maze_files=None, save_dir=None, cache_size=0, repeat=1, heuristic=None, landmarks=8,
+                  terrain=False):
+    """Benchmark every (maze, backend, algorithm) combination; returns a list of result rows
+
+    With cache_size > 0 searches go through the LRU path cache; `repeat` replays
+    the query list that many times to model repeated workloads. `heuristic`
+    selects the A* precomputation (see Maze.precompute_heuristic); `terrain`
+    adds weighted slow zones to generated mazes.
+    """
+    previous_mode, previous_capacity = profiler.mode, path_cache.capacity
+    profiler.set_mode(COUNTERS)
+    path_cache.capacity = cache_size
+    try:
+        corpus = load_mazes(maze_files) if maze_files else generate_mazes(sizes, mazes, seed, save_dir, terrain)
+        rows = []
+        for size, maze_number, maze_seed, maze in corpus:
+            maze.precompute_heuristic(heuristic, landmarks)
+            # Build the lazy tables here, not inside whichever backend's first timed query
+            maze.component_labels()  # Every search's reachable() guard
+            if not algorithms or "JPS" in algorithms:
+                maze.jump_tables()
+            if not algorithms or "HPA" in algorithms:
+                maze.cluster_graph().update()
+            pairs = random_queries(maze, queries, seed if maze_seed is None else maze_seed) * repeat
+            measured = set()  # A backend's fallback to another engine is not a row of its own
+            for backend in backends:
+                for name, search in BACKENDS[backend].items():
+                    if algorithms and name not in algorithms or search in measured:
+                        continue
+                    measured.add(search)
+                    row = {"size": size, "maze": maze_number, "seed": maze_seed, "terrain": maze.weighted,
+                           "backend": engine_of(search), "algorithm": name}
+                    path_cache.clear()
+                    row.update(summarize(run_searches(search, maze, pairs, cache_size > 0)))
+                    row["peak_memory_kb"] = round(peak_memory(search, maze, pairs), 2) if memory else ""
+                    rows.append(row)
+    finally:
+        profiler.set_mode(previous_mode)
+        path_cache.capacity = previous_capacity
+        path_cache.clear()  # Entries for the benchmark mazes are of no use to the caller
+    return rows
+
+
+def write_results(rows, output_format="csv", stream=sys.stdout):
+    if output_format == "json":
+        json.dump(rows, stream, indent=2)
+        stream.write("\n")
+    else:
+        writer = csv.DictWriter(stream, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
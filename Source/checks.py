@@ -0,0 +1,186 @@
+# Source\checks.py
+"""Headless self-checks for search behavior the benchmark numbers rely on."""
+import os
+import random
+import tempfile
+from time import perf_counter
+import numpy as np
+from maze import Maze, MazeOverlay
+import grid_search
+import search_algorithms
+from tracing import run_traced
+from instrumentation import profiler, MEMORY
+from benchmark import run_benchmark
+
+CHECKS = []
+
+
+def check(function):
+    """Register `function` as a check; it raises AssertionError on failure"""
+    CHECKS.append(function)
+    return function
+
+
+@check
+def d_star_lite_goal_move(size=150, moves=30, seed=0):
+    """Re-planning after one-cell goal moves must expand fewer nodes than fresh searches"""
+    rng = random.Random(seed)
+    maze = Maze(size, size, seed=seed)
+    start = maze.find_random_empty(rng)
+    goal = maze.find_random_empty(rng, reachable_from=start)
+    planner = search_algorithms.DStarLite(maze, start, goal)
+    search_algorithms.d_star_lite(maze, start, goal, planner)
+    incremental = fresh = 0
+    for _ in range(moves):
+        goal = rng.choice(maze.get_neighbors(goal))
+        path, expanded, _, _ = search_algorithms.d_star_lite(maze, start, goal, planner)
+        reference, expanded_fresh, _, _ = search_algorithms.d_star_lite(
+            maze, start, goal, search_algorithms.DStarLite(maze, start, goal))
+        assert len(path) == len(reference), f"path length {len(path)} != {len(reference)} for goal {goal}"
+        incremental += expanded
+        fresh += expanded_fresh
+    assert incremental < fresh, f"incremental expanded {incremental} >= fresh {fresh}"
+
+
+@check
+def bucket_queue_tie_break(size=200, queries=150, seed=0):
+    """A* on the bucket queue breaks f ties on h like the heap: same costs, about the same expansions"""
+    rng = random.Random(seed)
+    maze = Maze(size, size, seed=seed)
+    pairs = [(maze.find_random_empty(rng), maze.find_random_empty(rng)) for _ in range(queries)]
+    totals = {}
+    limit = search_algorithms.BUCKET_QUEUE_MAX_COST
+    try:
+        for queue, max_cost in (("bucket", limit), ("heap", 0)):
+            search_algorithms.BUCKET_QUEUE_MAX_COST = max_cost  # 0 turns the bucket queue off
+            totals[queue] = [grid_search.a_star(maze, start, goal)[:2] for start, goal in pairs]
+    finally:
+        search_algorithms.BUCKET_QUEUE_MAX_COST = limit
+    bucket, heap = totals["bucket"], totals["heap"]
+    assert [len(path) for path, _ in bucket] == [len(path) for path, _ in heap], "path lengths differ"
+    expanded_bucket = sum(expanded for _, expanded in bucket)
+    expanded_heap = sum(expanded for _, expanded in heap)
+    assert expanded_bucket <= 1.02 * expanded_heap, f"bucket queue expanded {expanded_bucket} vs heap {expanded_heap}"
+
+
+@check
+def maze_save_round_trip(size=20, seed=0):
+    """Saved mazes load back with the same walls and costs, including uniform non-1 costs"""
+    for costs in (None, np.full((size, size), 3), np.ones((size, size))):
+        maze = Maze(size, size, seed=seed, terrain=costs is None)
+        if costs is not None:
+            maze.set_costs(costs)
+        handle, path = tempfile.mkstemp(suffix=".pmaz")
+        os.close(handle)
+        try:
+            maze.save(path)
+            loaded = Maze.load(path)
+            assert np.array_equal(np.asarray(loaded.grid), np.asarray(maze.grid)), "walls differ after load"
+            assert np.array_equal(np.asarray(loaded.costs), maze.costs), "costs differ after load"
+            del loaded  # Release the memmaps before removing the file
+        finally:
+            os.remove(path)
+
+
+@check
+def traced_search_matches(size=60, queries=20, seed=0):
+    """Traced runs return the untraced (path, expanded_nodes) and trace every expansion"""
+    rng = random.Random(seed)
+    maze = Maze(size, size, seed=seed)
+    pairs = [(maze.find_random_empty(rng), maze.find_random_empty(rng)) for _ in range(queries)]
+    for registry in (search_algorithms.ALGORITHMS, grid_search.ALGORITHMS):
+        for name, search in registry.items():
+            for start, goal in pairs:
+                path, expanded_nodes = search(maze, start, goal)[:2]
+                (traced_path, traced_expanded, _, _), trace = run_traced(search, maze, start, goal)
+                where = f"{search.__module__}.{name} {start}->{goal}"
+                assert (list(traced_path), traced_expanded) == (list(path), expanded_nodes), f"{where}: traced result differs"
+                assert len(trace.expanded) == expanded_nodes, \
+                    f"{where}: trace has {len(trace.expanded)} expansions, search counted {expanded_nodes}"
+
+
+def _overlay_seconds(search, maze, pairs, blocked):
+    """Total time of `search` on a fresh MazeOverlay per query, as a ghost replanning around others"""
+    began = perf_counter()
+    for start, goal in pairs:
+        search(MazeOverlay(maze, blocked), start, goal)
+    return perf_counter() - began
+
+
+@check
+def jps_overlay_cost(size=101, queries=30, seed=0):
+    """JPS on a MazeOverlay must not rebuild jump tables: it costs about what A* does"""
+    rng = random.Random(seed)
+    maze = Maze(size, size, seed=seed)
+    maze.jump_tables()
+    pairs = [(maze.find_random_empty(rng), maze.find_random_empty(rng)) for _ in range(queries)]
+    blocked = [maze.find_random_empty(rng) for _ in range(3)]
+    pairs = [(start, goal) for start, goal in pairs if start not in blocked and goal not in blocked]
+    jps = _overlay_seconds(grid_search.jps, maze, pairs, blocked)
+    a_star = _overlay_seconds(grid_search.a_star, maze, pairs, blocked)
+    assert jps < 2 * a_star + 0.005, f"JPS on overlays took {jps * 1e3:.1f} ms vs {a_star * 1e3:.1f} ms for A*"
+
+
+@check
+def hpa_overlay_cost(size=101, queries=30, seed=0):
+    """A collision replan (next cell blocked) costs HPA* a local detour, not a cluster rebuild"""
+    rng = random.Random(seed)
+    maze = Maze(size, size, seed=seed)
+    maze.cluster_graph().update()
+    replans = []
+    for _ in range(queries):
+        start, goal = maze.find_random_empty(rng), maze.find_random_empty(rng)
+        path = grid_search.hpa_star(maze, start, goal)[0]
+        if len(path) > 1:
+            replans.append((start, goal, path[0]))
+    began = perf_counter()
+    for start, goal, _ in replans:
+        grid_search.hpa_star(maze, start, goal)
+    plain = perf_counter() - began
+    began = perf_counter()
+    for start, goal, blocked in replans:
+        path = grid_search.hpa_star(MazeOverlay(maze, [blocked]), start, goal)[0]
+        assert blocked not in path, f"HPA* path from {start} runs through blocked cell {blocked}"
+    overlay = perf_counter() - began
+    assert overlay < 3 * plain + 0.005, f"HPA* on overlays took {overlay * 1e3:.1f} ms vs {plain * 1e3:.1f} ms without"
+
+
+@check
+def landmarks_keep_maze_rng(size=60, seed=3):
+    """Precomputing landmarks must not consume the maze's seeded random draws"""
+    plain, with_landmarks = Maze(size, size, seed=seed), Maze(size, size, seed=seed)
+    with_landmarks.precompute_heuristic("landmarks", 8)
+    draws = [plain.find_random_empty() for _ in range(5)]
+    assert [with_landmarks.find_random_empty() for _ in range(5)] == draws, "landmark precomputation moved the maze RNG"
+
+
+@check
+def benchmark_restores_state():
+    """run_benchmark leaves the profiler mode and the path cache capacity as it found them"""
+    previous_mode, previous_capacity = profiler.mode, search_algorithms.path_cache.capacity
+    profiler.set_mode(MEMORY)
+    search_algorithms.path_cache.capacity = 7
+    try:
+        run_benchmark([15], queries=5, algorithms=["BFS"], cache_size=32)
+        assert profiler.mode == MEMORY, f"profiler mode left at {profiler.mode}"
+        assert search_algorithms.path_cache.capacity == 7, \
+            f"path cache capacity left at {search_algorithms.path_cache.capacity}"
+    finally:
+        profiler.set_mode(previous_mode)
+        search_algorithms.path_cache.capacity = previous_capacity
+
+
+def run_checks(names=None):
+    """Run the registered checks (or only `names`), print one line each; returns the failure count"""
+    failures = 0
+    for function in CHECKS:
+        if names and function.__name__ not in names:
+            continue
+        try:
+            function()
+        except AssertionError as error:
+            failures += 1
+            print(f"FAIL {function.__name__}: {error}")
+        else:
+            print(f"ok   {function.__name__}")
+    return failures
@@ -3,6 +3,67 @@ WIDTH, HEIGHT = 800, 800
 GRID_SIZE = 20
 CELL_SIZE = WIDTH // GRID_SIZE
 
+# Maze source: a file written by Maze.save (must be GRID_SIZE x GRID_SIZE),
+# otherwise a freshly generated maze; a seed makes it reproducible
+MAZE_FILE = None
+MAZE_SEED = None
+MAZE_TERRAIN = False  # Generated mazes get slow zones (weighted cells, see Maze.generate_terrain)
+
+# The simulation advances in fixed ticks, independent of the render frame rate
+SIMULATION_TICK_RATE = 10  # Ticks per second at normal speed
+RENDER_FPS = 30
+MAX_TICKS_PER_FRAME = 5  # Catch-up limit after a slow frame; older backlog is dropped
+GHOST_MOVE_TICKS = 3  # A ghost steps once every this many ticks
+# Max speed (F during the game) runs as many ticks as fit between frames; it still
+# draws this many frames per second, 0 draws nothing until max speed is turned off
+MAX_SPEED_RENDER_FPS = 10
+
+# A ghost reaching Pac-Man opens a stats overlay (SPACE closes it); True pauses the
+# simulation while one is open, False lets the other ghosts keep moving
+PAUSE_ON_STATS = False
+# JSON lines file that gets one metrics object per ghost reaching Pac-Man (None = off)
+METRICS_FILE = None
+
+# Search backend: "dict" (tuple nodes) or "array" (flat cell indices)
+SEARCH_BACKEND = "dict"
+
+# Replanning: "full" searches from scratch, "incremental" reuses a D* Lite tree
+PLANNER_MODE = "full"
+
+# Algorithms whose ghosts follow one shared distance field from Pac-Man instead of
+# searching on their own, e.g. ("BFS", "UCS", "Astar"); empty keeps per-ghost searches
+SHARED_FIELD_ALGORITHMS = ()
+
+# Nodes a BFS/UCS/A* ghost's search may expand per tick; a longer search resumes next
+# tick while the ghost keeps walking its current path (0 = every search finishes at once)
+SEARCH_NODE_BUDGET = 0
+
+# Worker processes for the per-tick parallel planning stage (0 = search on the main thread)
+PARALLEL_WORKERS = 0
+
+# Ghosts record the expansion order of their searches from the start (H in the game
+# cycles the heatmap overlay through the ghosts and turns tracing on for the shown one)
+TRACE_SEARCHES = False
+
+# Search instrumentation: "off", "counters" (perf_counter_ns) or "memory" (tracemalloc)
+INSTRUMENTATION_MODE = "counters"
+INSTRUMENTATION_CAPACITY = 1024  # Records kept in the ring buffer
+
+# LRU path cache entries (0 disables the cache)
+PATH_CACHE_SIZE = 0
+
+# A* heuristic precomputation: None (Manhattan only), "landmarks" (ALT lower bounds)
+# or "table" (exact all-pairs distances, small grids only)
+HEURISTIC_PRECOMPUTE = None
+LANDMARK_COUNT = 8
+
+# UCS/A* use a bucket queue (Dial) instead of heapq while the largest step cost
+# of the maze is an integer up to this value
+BUCKET_QUEUE_MAX_COST = 64
+
+# HPA* (the "HPA" ghost): edge length in cells of the clusters the maze is cut into
+HPA_CLUSTER_SIZE = 16
+
 # Colors
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
@@ -11,4 +72,9 @@ PINK = (255, 182, 193)
 ORANGE = (255, 165, 0)
 YELLOW = (255, 255, 0)
 GRAY = (128, 128, 128)
-RED = (255, 0, 0)
\ No newline at end of file
+RED = (255, 0, 0)
+CYAN = (0, 255, 255)
+LIGHT_BLUE = (135, 206, 250)
+MAGENTA = (255, 0, 255)
+BROWN = (90, 60, 30)
+GREEN = (0, 200, 0)
\ No newline at end of file
@@ -1,9 +1,23 @@
+from collections import deque
 from constants import *
-from search_algorithms import bfs, dfs, ucs, a_star
-import pygame
+from instrumentation import profiler, OFF, MEMORY
+import search_algorithms
+from grid_search import BACKENDS, SlicedSearch
+from maze import MazeOverlay
+from tracing import run_traced
+
+# Algorithms whose paths are shortest paths, so D* Lite can stand in for them
+INCREMENTAL_ALGORITHMS = ("BFS", "UCS", "Astar", "JPS", "BiBFS", "BiAstar")
+# Algorithms that ignore terrain costs; on a weighted maze only these can use
+# unit-cost planners (D* Lite, the shared BFS distance field)
+UNWEIGHTED_ALGORITHMS = ("BFS", "BiBFS")
+# Algorithms whose path is refined leg by leg while the ghost walks it (not path-cached)
+LAZY_ALGORITHMS = ("HPA",)
+# Algorithms a SlicedSearch can stand in for when SEARCH_NODE_BUDGET spreads searches over ticks
+SLICED_ALGORITHMS = ("BFS", "UCS", "Astar")
 
 class Ghost:
-    def __init__(self, algorithm, start_pos=(0, 0)):
+    def __init__(self, algorithm, start_pos=(0, 0), backend=SEARCH_BACKEND, planner=PLANNER_MODE):
         # Set color based on algorithm
         if algorithm == "BFS":
             self.color = BLUE
@@ -13,81 +27,160 @@ class Ghost:
             self.color = ORANGE
         elif algorithm =="Astar":
             self.color = RED    
+        elif algorithm == "JPS":
+            self.color = CYAN
+        elif algorithm == "BiBFS":
+            self.color = LIGHT_BLUE
+        elif algorithm == "BiAstar":
+            self.color = MAGENTA
+        elif algorithm == "HPA":
+            self.color = GREEN
         self.algorithm = algorithm
+        self.backend = backend
+        self.planner = planner
+        self.incremental_planner = None  # DStarLite tree kept between searches
         self.position = start_pos
-        self.path = []
+        self.path = deque()  # Next cells to walk, consumed with popleft()
         self.total_expanded_nodes = 0
         self.total_search_time = 0
         self.total_memory_usage = 0  # KB
         self.search_count = 0
+        self.search_history = deque(maxlen=INSTRUMENTATION_CAPACITY)  # This ghost's SearchRecords
         self.move_counter = 0
         self.search_interval = 2
         self.move_delay = 0
         self.reached_target = False
         self.started = False
         self.stored_pacman_pos = None
+        self.plan_ready = False  # Path already searched for this move (parallel planning stage)
+        self.tracing = TRACE_SEARCHES  # Record expansions of the own searches (runtime heatmap)
+        self.last_trace = None  # SearchTrace of the latest traced search
+        self.node_budget = SEARCH_NODE_BUDGET  # Nodes per tick for a sliced search (0 = unsliced)
+        self.sliced_search = None  # SlicedSearch still running from an earlier tick
+        self.nodes_left = 0  # This tick's remaining node budget
         
-    def find_path(self, maze, pacman_pos, screen=None, font=None):
+    def find_path(self, maze, pacman_pos, blocked=(), field=None):
         # update pacman position
         if pacman_pos != self.stored_pacman_pos:
             self.stored_pacman_pos = pacman_pos
 
-        if self.algorithm == "BFS":
-            path, expanded_nodes, search_time, memory_usage = bfs(maze, self.position, pacman_pos)
-        elif self.algorithm == "DFS":
-            path, expanded_nodes, search_time, memory_usage = dfs(maze, self.position, pacman_pos)
-        elif self.algorithm == "UCS":
-            path, expanded_nodes, search_time, memory_usage = ucs(maze, self.position, pacman_pos)
-        elif self.algorithm == "Astar":
-            path, expanded_nodes, search_time, memory_usage = a_star(maze, self.position, pacman_pos)
-        self.path = path
+        # Read the path off the shared distance field; search only if it is cut off
+        if not self.tracing and field is not None and field.source == maze.index(pacman_pos):
+            self.path = deque(field.path_from(self.position, blocked))
+            if self.path:
+                self.move_counter = 0
+                return
+
+        if not blocked and self.time_sliced():
+            # Keep walking the current path; the search advances a budget's worth per tick
+            if self.sliced_search is None:
+                self.sliced_search = SlicedSearch(
+                    maze, self.position, pacman_pos, weighted=self.algorithm != "BFS", name=self.algorithm)
+                self.advance_search(pacman_pos)
+            return
+
+        if (not self.tracing and self.planner == "incremental" and self.algorithm in INCREMENTAL_ALGORITHMS
+                and (not maze.weighted or self.algorithm in UNWEIGHTED_ALGORITHMS)):
+            if self.incremental_planner is None:
+                self.incremental_planner = search_algorithms.DStarLite(maze, self.position, pacman_pos)
+            path, expanded_nodes, search_time, memory_usage = search_algorithms.d_star_lite(
+                maze, self.position, pacman_pos, self.incremental_planner, blocked)
+        else:
+            if blocked:
+                maze = MazeOverlay(maze, blocked)
+            search = BACKENDS[self.backend][self.algorithm]
+            if self.tracing:
+                # Traced searches bypass the path cache so every replan leaves a trace
+                (path, expanded_nodes, search_time, memory_usage), self.last_trace = run_traced(
+                    search, maze, self.position, pacman_pos)
+            elif self.algorithm in LAZY_ALGORITHMS:
+                path, expanded_nodes, search_time, memory_usage = search(
+                    maze, self.position, pacman_pos, lazy=True)
+            else:
+                path, expanded_nodes, search_time, memory_usage = search_algorithms.path_cache.search(
+                    search, maze, self.position, pacman_pos)
+        record = profiler.last() if profiler.mode != OFF else None
+        self.apply_search((path, expanded_nodes, search_time, memory_usage), pacman_pos, record)
+
+    def time_sliced(self):
+        """True if this ghost's searches run as SlicedSearch, a node budget per tick"""
+        return self.node_budget > 0 and self.algorithm in SLICED_ALGORITHMS and not self.tracing
+
+    def advance_search(self, pacman_pos):
+        """Spend what is left of this tick's node budget on the pending sliced search"""
+        search = self.sliced_search
+        expanded_before = search.expanded_nodes
+        done = search.advance(self.nodes_left)
+        self.nodes_left -= search.expanded_nodes - expanded_before
+        if done:
+            self.sliced_search = None
+            result = search.result(self.position)  # The ghost may have walked on meanwhile
+            self.apply_search(result, pacman_pos, profiler.last() if profiler.mode != OFF else None)
+            self.stored_pacman_pos = search.goal_position  # Replan right away if Pac-Man moved meanwhile
+
+    def needs_replan(self, pacman_pos):
+        """True if the next call to move() will search for a new path"""
+        return (self.started and self.move_delay + 1 >= GHOST_MOVE_TICKS
+                and (not self.path or self.stored_pacman_pos != pacman_pos))
+
+    def can_plan_in_parallel(self, field=None):
+        """Stateless searches only: incremental planners, shared fields, traced and sliced searches stay on the main process"""
+        incremental = self.planner == "incremental" and self.algorithm in INCREMENTAL_ALGORITHMS
+        return field is None and not incremental and not self.tracing and not self.time_sliced()
+
+    def apply_search(self, result, pacman_pos, record=None):
+        """Store a search result (path, expanded_nodes, search_time, memory_usage) and update stats"""
+        path, expanded_nodes, search_time, memory_usage = result
+        self.stored_pacman_pos = pacman_pos
+        self.path = path if isinstance(path, deque) else deque(path)
         self.total_expanded_nodes += expanded_nodes
         self.total_search_time += search_time
         self.total_memory_usage += memory_usage
         self.search_count += 1
+        if record is not None:
+            self.search_history.append(record)
         self.move_counter = 0
         
-        # Check if reached target
-        if self.position == pacman_pos and not self.reached_target:
+        # Check if reached target (the runtime shows the final stats)
+        if self.position == pacman_pos:
             self.reached_target = True
-            if screen and font:
-                self.show_final_stats(screen, font)
         
-    def move(self, maze, pacman_pos, screen=None, font=None, other_ghost_positions=[]):
+    def move(self, maze, pacman_pos, other_ghost_positions=[], field=None):
         if not self.started:
             return
-            
+
+        self.nodes_left = self.node_budget
+        if self.sliced_search is not None:
+            self.advance_search(pacman_pos)
+
         self.move_delay += 1
-        if self.move_delay < 3:  # Slow down movement
+        if self.move_delay < GHOST_MOVE_TICKS:  # Slow down movement
             return
         self.move_delay = 0
         
         # Recalculate path if needed
         # if not self.path or self.move_counter >= self.search_interval:
-        if not self.path or self.stored_pacman_pos != pacman_pos:
-            self.find_path(maze, pacman_pos, screen, font)
+        if self.plan_ready:
+            self.plan_ready = False
+        elif not self.path or self.stored_pacman_pos != pacman_pos:
+            self.find_path(maze, pacman_pos, field=field)
         
         if self.path:
             next_pos = self.path[0]
             if next_pos in other_ghost_positions:
-                modded_maze = maze.copy()
-                for ghost_pos in other_ghost_positions:
-                    modded_maze.tag(ghost_pos)
-                self.find_path(modded_maze, pacman_pos, screen, font)
+                self.find_path(maze, pacman_pos, blocked=other_ghost_positions, field=field)
                 return
             if not maze.is_wall(next_pos):
                 self.position = next_pos
-                self.path.pop(0)
+                self.path.popleft()
                 self.move_counter += 1
                 
                 # Check if reached target after move
-                if self.position == pacman_pos and not self.reached_target:
+                if self.position == pacman_pos:
                     self.reached_target = True
-                    if screen and font:
-                        self.show_final_stats(screen, font)
             else:
                 # Recalculate path if wall encountered
-                self.find_path(maze, pacman_pos, screen, font)
+                self.find_path(maze, pacman_pos)
     
     def start(self):
         self.started = True
@@ -96,11 +189,29 @@ class Ghost:
         self.started = False
 
 
-    def show_final_stats(self, screen, font):
-        """Display final statistics when reaching target"""
+    def final_metrics(self):
+        """This ghost's search statistics as a flat dict (for the metrics output)"""
+        metrics = {
+            "event": "reached_target",
+            "algorithm": self.algorithm,
+            "backend": self.backend,
+            "planner": self.planner,
+            "position": list(self.position),
+            "searches": self.search_count,
+            "total_search_time": self.total_search_time,
+            "total_expanded_nodes": self.total_expanded_nodes,
+            "average_memory_kb": self.total_memory_usage / self.search_count if self.search_count else 0.0,
+        }
+        if self.search_history:
+            metrics["frontier_peak"] = max(r.frontier_peak for r in self.search_history)
+            metrics["cache_hit_rate"] = sum(1 for r in self.search_history if r.cached) / len(self.search_history)
+        return metrics
+
+    def final_stats(self):
+        """Lines of the final statistics popup, or None if this ghost never searched"""
         if self.search_count == 0:
-            return
-            
+            return None
+
         avg_memory = self.total_memory_usage / self.search_count
         stats = [
             f"Algorithm: {self.algorithm}",
@@ -109,47 +220,17 @@ class Ghost:
             "=== Search Statistics ===",
             f"Total Search Time: {self.total_search_time:.4f} seconds",
             f"Total Expanded Nodes: {self.total_expanded_nodes}",
-            f"Average Memory Usage: {avg_memory:.2f} KB",
+        ]
+        if profiler.mode == MEMORY:
+            stats.append(f"Average Memory Usage: {avg_memory:.2f} KB")
+        if self.search_history:
+            stats.append(f"Peak Frontier Size: {max(r.frontier_peak for r in self.search_history)}")
+        if search_algorithms.path_cache.capacity > 0 and self.search_history:
+            hit_rate = sum(1 for r in self.search_history if r.cached) / len(self.search_history)
+            stats.append(f"Path Cache Hit Rate: {hit_rate:.0%}")
+        stats += [
             f"Number of Searches: {self.search_count}",
             "",
             "SPACE to continue"
         ]
-        
-        # Calculate popup size
-        popup_width = 450
-        line_height = 30
-        popup_height = len(stats) * line_height + 20
-        
-        # Draw popup background
-        popup_rect = pygame.Rect(
-            (WIDTH - popup_width) // 2,
-            (HEIGHT - popup_height) // 2,
-            popup_width,
-            popup_height
-        )
-        pygame.draw.rect(screen, (50, 50, 50), popup_rect)
-        pygame.draw.rect(screen, WHITE, popup_rect, 2)
-        
-        # Draw text
-        for i, stat in enumerate(stats):
-            text_surface = font.render(stat, True, WHITE)
-            screen.blit(text_surface, (
-                popup_rect.x + 20,
-                popup_rect.y + 10 + i * line_height
-            ))
-        
-        pygame.display.flip()
-        
-        # Wait for space to reset
-        waiting = True
-        while waiting:
-            for event in pygame.event.get():
-                # if event.type == pygame.QUIT:
-                #     pygame.quit()
-                #     sys.exit()
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_SPACE:
-                        waiting = False
-                    # elif event.key == pygame.K_ESCAPE:
-                    #     pygame.quit()
-                    #     sys.exit()
+        return stats
@@ -0,0 +1,791 @@
+# Source\grid_search.py
+"""Array-backed search engine.
+
+Same algorithms and results as search_algorithms, but every node is an
+integer cell index (see Maze.index) instead of an (x, y) tuple. Parents and
+costs live in preallocated flat lists and neighbors come from the maze's
+4-bit neighbor mask (one bytearray read per node), so no per-node hashing
+or list building happens inside the loops.
+"""
+from collections import deque
+import heapq
+from time import perf_counter_ns
+import search_algorithms
+from search_algorithms import measure_performance
+from instrumentation import profiler, SearchRecord, OFF
+from hierarchy import hpa_star
+from maze import MazeOverlay
+
+UNVISITED = -1
+
+
+def reconstruct_path(maze, parent, start, goal):
+    """Walk parent links from goal back to start (start excluded)"""
+    path = []
+    current = goal
+    while current != start:
+        path.append(maze.position(current))
+        current = parent[current]
+    path.reverse()
+    return path
+
+
+@measure_performance
+def bfs(maze, start, goal):
+    mask, steps = maze.neighbor_mask, maze.mask_offsets
+    start, goal = maze.index(start), maze.index(goal)
+    parent = [UNVISITED] * len(mask)
+    parent[start] = start
+    queue = deque([start])
+    expanded_nodes = 0
+    frontier_peak = visited_count = 1
+
+    while queue:
+        current = queue.popleft()
+        # trace: expand(current)
+        expanded_nodes += 1
+
+        if current == goal:
+            break
+
+        for step in steps[mask[current]]:
+            neighbor = current + step
+            if parent[neighbor] == UNVISITED:
+                parent[neighbor] = current
+                queue.append(neighbor)
+                # trace: discover(neighbor)
+                visited_count += 1
+        if len(queue) > frontier_peak:
+            frontier_peak = len(queue)
+
+    if parent[goal] == UNVISITED:
+        return [], expanded_nodes, frontier_peak, visited_count
+    return reconstruct_path(maze, parent, start, goal), expanded_nodes, frontier_peak, visited_count
+
+
+@measure_performance
+def dfs(maze, start, goal):
+    mask, steps = maze.neighbor_mask, maze.mask_offsets
+    start, goal = maze.index(start), maze.index(goal)
+    parent = [UNVISITED] * len(mask)
+    parent[start] = start
+    stack = [start]
+    expanded_nodes = 0
+    frontier_peak = visited_count = 1
+
+    while stack:
+        current = stack.pop()
+        # trace: expand(current)
+        expanded_nodes += 1
+
+        if current == goal:
+            # DFS path includes the start cell, as in search_algorithms.dfs
+            path = [maze.position(start)] + reconstruct_path(maze, parent, start, goal)
+            return path, expanded_nodes, frontier_peak, visited_count
+
+        for step in reversed(steps[mask[current]]):
+            neighbor = current + step
+            if parent[neighbor] == UNVISITED:
+                parent[neighbor] = current
+                stack.append(neighbor)
+                # trace: discover(neighbor)
+                visited_count += 1
+        if len(stack) > frontier_peak:
+            frontier_peak = len(stack)
+
+    return [], expanded_nodes, frontier_peak, visited_count
+
+
+def _ucs_buckets(maze, start, goal, span):
+    """UCS over a circular bucket queue (Dial), same pop order as search_algorithms.BucketQueue"""
+    mask, steps, costs = maze.neighbor_mask, maze.mask_offsets, maze.step_costs
+    start, goal = maze.index(start), maze.index(goal)
+    parent = [UNVISITED] * len(mask)
+    cost = [UNVISITED] * len(mask)
+    closed = bytearray(len(mask))
+    parent[start] = start
+    cost[start] = 0
+    buckets = [[] for _ in range(span)]
+    buckets[0].append(start)
+    cursor = 0
+    expanded_nodes = 0
+    size = frontier_peak = visited_count = 1
+
+    while size:
+        bucket = buckets[cursor % span]
+        while not bucket:
+            cursor += 1
+            bucket = buckets[cursor % span]
+        current = bucket.pop()
+        size -= 1
+        if closed[current]:
+            continue  # Stale entry (lazy deletion)
+        closed[current] = 1
+        # trace: expand(current)
+        expanded_nodes += 1
+
+        if current == goal:
+            break
+
+        for step in steps[mask[current]]:
+            neighbor = current + step
+            if closed[neighbor]:
+                continue
+            new_cost = cursor + costs[neighbor]
+            old_cost = cost[neighbor]
+            if old_cost == UNVISITED or new_cost < old_cost:
+                if old_cost == UNVISITED:
+                    # trace: discover(neighbor)
+                    visited_count += 1
+                parent[neighbor] = current
+                cost[neighbor] = new_cost
+                buckets[new_cost % span].append(neighbor)
+                size += 1
+        if size > frontier_peak:
+            frontier_peak = size
+
+    if parent[goal] == UNVISITED:
+        return [], expanded_nodes, frontier_peak, visited_count
+    return reconstruct_path(maze, parent, start, goal), expanded_nodes, frontier_peak, visited_count
+
+
+@measure_performance
+def ucs(maze, start, goal):
+    span = search_algorithms.bucket_span(maze)
+    if span:
+        return _ucs_buckets(maze, start, goal, span)
+    mask, steps, costs = maze.neighbor_mask, maze.mask_offsets, maze.step_costs
+    start, goal = maze.index(start), maze.index(goal)
+    parent = [UNVISITED] * len(mask)
+    cost = [UNVISITED] * len(mask)
+    closed = bytearray(len(mask))
+    parent[start] = start
+    cost[start] = 0
+    heap = [(0, start)]
+    expanded_nodes = 0
+    frontier_peak = visited_count = 1
+
+    while heap:
+        current_cost, current = heapq.heappop(heap)
+        if closed[current]:
+            continue  # Stale entry (lazy deletion)
+        closed[current] = 1
+        # trace: expand(current)
+        expanded_nodes += 1
+
+        if current == goal:
+            break
+
+        for step in steps[mask[current]]:
+            neighbor = current + step
+            if closed[neighbor]:
+                continue
+            new_cost = current_cost + costs[neighbor]
+            old_cost = cost[neighbor]
+            if old_cost == UNVISITED or new_cost < old_cost:
+                if old_cost == UNVISITED:
+                    # trace: discover(neighbor)
+                    visited_count += 1
+                parent[neighbor] = current
+                cost[neighbor] = new_cost
+                heapq.heappush(heap, (new_cost, neighbor))
+        if len(heap) > frontier_peak:
+            frontier_peak = len(heap)
+
+    if parent[goal] == UNVISITED:
+        return [], expanded_nodes, frontier_peak, visited_count
+    return reconstruct_path(maze, parent, start, goal), expanded_nodes, frontier_peak, visited_count
+
+
+def _a_star_buckets(maze, start, goal, span):
+    """A* over a circular bucket queue keyed on f, same pop order as search_algorithms.BucketQueue
+
+    Each bucket is sorted once when the cursor reaches it so the smallest h
+    (largest g) pops first; the heuristic is consistent, so cells pushed into
+    the current bucket always have a smaller h than the one just popped.
+    """
+    mask, steps, costs = maze.neighbor_mask, maze.mask_offsets, maze.step_costs
+    height = maze.height
+    scale = maze.min_step_cost  # Scaled heuristic stays admissible on weighted terrain
+    goal_x, goal_y = goal
+    start_x, start_y = start
+    start, goal = maze.index(start), maze.index(goal)
+    bound = maze.distance_bound(goal)
+    parent = [UNVISITED] * len(mask)
+    cost = [UNVISITED] * len(mask)
+    closed = bytearray(len(mask))
+    parent[start] = start
+    cost[start] = 0
+    buckets = [[] for _ in range(span)]
+    cursor = scale * (abs(start_x - goal_x) + abs(start_y - goal_y) if bound is None else max(bound(start), 0))
+    buckets[cursor % span].append(start)
+    ordered = None  # f of the bucket already sorted on h
+    expanded_nodes = 0
+    size = frontier_peak = visited_count = 1
+
+    while size:
+        bucket = buckets[cursor % span]
+        while not bucket:
+            cursor += 1
+            bucket = buckets[cursor % span]
+        if ordered != cursor:
+            bucket.sort(key=cost.__getitem__)  # h = f - g: largest g last; stable, so ties stay LIFO
+            ordered = cursor
+        current = bucket.pop()
+        size -= 1
+        if closed[current]:
+            continue  # Stale entry (lazy deletion)
+        closed[current] = 1
+        # trace: expand(current)
+        expanded_nodes += 1
+
+        if current == goal:
+            break
+
+        current_cost = cost[current]
+        for step in steps[mask[current]]:
+            neighbor = current + step
+            if closed[neighbor]:
+                continue
+            new_cost = current_cost + costs[neighbor]
+            old_cost = cost[neighbor]
+            if old_cost == UNVISITED or new_cost < old_cost:
+                if bound is None:
+                    x, y = divmod(neighbor, height)
+                    f = new_cost + scale * (abs(x - goal_x) + abs(y - goal_y))
+                else:
+                    h = bound(neighbor)
+                    if h < 0:
+                        continue  # Cannot reach the goal from here
+                    f = new_cost + scale * h
+                if old_cost == UNVISITED:
+                    # trace: discover(neighbor)
+                    visited_count += 1
+                parent[neighbor] = current
+                cost[neighbor] = new_cost
+                if f < cursor:
+                    cursor = f
+                buckets[f % span].append(neighbor)
+                size += 1
+        if size > frontier_peak:
+            frontier_peak = size
+
+    if parent[goal] == UNVISITED:
+        return [], expanded_nodes, frontier_peak, visited_count
+    return reconstruct_path(maze, parent, start, goal), expanded_nodes, frontier_peak, visited_count
+
+
+@measure_performance
+def a_star(maze, start, goal):
+    span = search_algorithms.bucket_span(maze)
+    if span:
+        return _a_star_buckets(maze, start, goal, span)
+    mask, steps, costs = maze.neighbor_mask, maze.mask_offsets, maze.step_costs
+    height = maze.height
+    scale = maze.min_step_cost
+    goal_x, goal_y = goal
+    start, goal = maze.index(start), maze.index(goal)
+    bound = maze.distance_bound(goal)  # ALT / exact-table bound when precomputed, else Manhattan
+    parent = [UNVISITED] * len(mask)
+    cost = [UNVISITED] * len(mask)
+    closed = bytearray(len(mask))
+    parent[start] = start
+    cost[start] = 0
+    heap = [(0, 0, start)]  # (f, h, cell): ties on f go to the cell nearer the goal
+    expanded_nodes = 0
+    frontier_peak = visited_count = 1
+
+    while heap:
+        _, _, current = heapq.heappop(heap)
+        if closed[current]:
+            continue  # Stale entry (lazy deletion)
+        closed[current] = 1
+        # trace: expand(current)
+        expanded_nodes += 1
+
+        if current == goal:
+            break
+
+        current_cost = cost[current]
+        for step in steps[mask[current]]:
+            neighbor = current + step
+            if closed[neighbor]:
+                continue
+            new_cost = current_cost + costs[neighbor]
+            old_cost = cost[neighbor]
+            if old_cost == UNVISITED or new_cost < old_cost:
+                if bound is None:
+                    x, y = divmod(neighbor, height)
+                    h = scale * (abs(x - goal_x) + abs(y - goal_y))
+                else:
+                    h = bound(neighbor)
+                    if h < 0:
+                        continue  # Cannot reach the goal from here
+                    h *= scale
+                if old_cost == UNVISITED:
+                    # trace: discover(neighbor)
+                    visited_count += 1
+                parent[neighbor] = current
+                cost[neighbor] = new_cost
+                heapq.heappush(heap, (new_cost + h, h, neighbor))
+        if len(heap) > frontier_peak:
+            frontier_peak = len(heap)
+
+    if parent[goal] == UNVISITED:
+        return [], expanded_nodes, frontier_peak, visited_count
+    return reconstruct_path(maze, parent, start, goal), expanded_nodes, frontier_peak, visited_count
+
+
+def _join_paths(maze, parents, start, goal, meet):
+    """Path start -> meet (forward parents) then meet -> goal (backward parents), start excluded"""
+    forward, backward = parents
+    path = reconstruct_path(maze, forward, start, meet)
+    current = meet
+    while current != goal:
+        current = backward[current]
+        path.append(maze.position(current))
+    return path
+
+
+@measure_performance
+def bidirectional_bfs(maze, start, goal):
+    """BFS from both ends, one whole layer at a time from the smaller frontier
+
+    Stops after the first layer in which the two searches meet; finishing the
+    layer and keeping the cheapest meeting cell makes the path shortest.
+    """
+    mask, steps = maze.neighbor_mask, maze.mask_offsets
+    start, goal = maze.index(start), maze.index(goal)
+    if start == goal:
+        return [], 1, 1, 1
+    parents = ([UNVISITED] * len(mask), [UNVISITED] * len(mask))  # forward, backward
+    dists = ([UNVISITED] * len(mask), [UNVISITED] * len(mask))
+    parents[0][start], parents[1][goal] = start, goal
+    dists[0][start] = dists[1][goal] = 0
+    queues = (deque([start]), deque([goal]))
+    expanded_nodes = 0
+    frontier_peak = visited_count = 2
+    best, meet = search_algorithms.INF, UNVISITED
+
+    while queues[0] and queues[1] and meet == UNVISITED:
+        side = 0 if len(queues[0]) <= len(queues[1]) else 1
+        queue, parent, dist, other = queues[side], parents[side], dists[side], dists[1 - side]
+        for _ in range(len(queue)):
+            current = queue.popleft()
+            # trace: expand(current)
+            expanded_nodes += 1
+            new_dist = dist[current] + 1
+            for step in steps[mask[current]]:
+                neighbor = current + step
+                if dist[neighbor] == UNVISITED:
+                    parent[neighbor] = current
+                    dist[neighbor] = new_dist
+                    queue.append(neighbor)
+                    # trace: discover(neighbor)
+                    visited_count += 1
+                    if other[neighbor] != UNVISITED and new_dist + other[neighbor] < best:
+                        best, meet = new_dist + other[neighbor], neighbor
+        if len(queues[0]) + len(queues[1]) > frontier_peak:
+            frontier_peak = len(queues[0]) + len(queues[1])
+
+    if meet == UNVISITED:
+        return [], expanded_nodes, frontier_peak, visited_count
+    return _join_paths(maze, parents, start, goal, meet), expanded_nodes, frontier_peak, visited_count
+
+
+@measure_performance
+def bidirectional_a_star(maze, start, goal):
+    """Front-to-end bidirectional A*: forward toward goal, backward toward start
+
+    Each side expands in A* order with its own heuristic; the best meeting cost
+    found so far is optimal once it is no larger than either side's smallest f.
+    Stepping costs the entered cell's cost, so the backward side pays for the
+    cell it expands rather than the one it reaches.
+    """
+    mask, steps, step_costs = maze.neighbor_mask, maze.mask_offsets, maze.step_costs
+    height = maze.height
+    scale = maze.min_step_cost
+    targets = (goal, start)  # What each side searches toward
+    start, goal = maze.index(start), maze.index(goal)
+    if start == goal:
+        return [], 1, 1, 1
+    bounds = (maze.distance_bound(goal), maze.distance_bound(start))
+    parents = ([UNVISITED] * len(mask), [UNVISITED] * len(mask))  # forward, backward
+    costs = ([UNVISITED] * len(mask), [UNVISITED] * len(mask))
+    parents[0][start], parents[1][goal] = start, goal
+    costs[0][start] = costs[1][goal] = 0
+    heaps = ([(0, 0, start)], [(0, 0, goal)])  # (f, h, cell)
+    expanded_nodes = 0
+    frontier_peak = visited_count = 2
+    best, meet = search_algorithms.INF, UNVISITED
+
+    while heaps[0] and heaps[1]:
+        if best <= max(heaps[0][0][0], heaps[1][0][0]):
+            break
+        side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+        heap, parent, cost, other = heaps[side], parents[side], costs[side], costs[1 - side]
+        target_x, target_y = targets[side]
+        bound = bounds[side]
+
+        f, h, current = heapq.heappop(heap)
+        if f - h > cost[current]:
+            continue  # Stale entry, the cell was reached more cheaply since
+        # trace: expand(current)
+        expanded_nodes += 1
+
+        current_cost = cost[current]
+        for step in steps[mask[current]]:
+            neighbor = current + step
+            new_cost = current_cost + step_costs[current if side else neighbor]
+            old_cost = cost[neighbor]
+            if old_cost == UNVISITED or new_cost < old_cost:
+                if bound is None:
+                    x, y = divmod(neighbor, height)
+                    h = scale * (abs(x - target_x) + abs(y - target_y))
+                else:
+                    h = bound(neighbor)
+                    if h < 0:
+                        continue  # Cannot reach the target from here
+                    h *= scale
+                if old_cost == UNVISITED:
+                    # trace: discover(neighbor)
+                    visited_count += 1
+                parent[neighbor] = current
+                cost[neighbor] = new_cost
+                heapq.heappush(heap, (new_cost + h, h, neighbor))
+                if other[neighbor] != UNVISITED and new_cost + other[neighbor] < best:
+                    best, meet = new_cost + other[neighbor], neighbor
+        if len(heaps[0]) + len(heaps[1]) > frontier_peak:
+            frontier_peak = len(heaps[0]) + len(heaps[1])
+
+    if meet == UNVISITED:
+        return [], expanded_nodes, frontier_peak, visited_count
+    return _join_paths(maze, parents, start, goal, meet), expanded_nodes, frontier_peak, visited_count
+
+
+def _jump(run, jump, height, current, direction, goal_x, goal_y):
+    """Distance from current to the next jump point in `direction` (0 if none), goal included
+
+    The tables ignore the goal, so check whether it lies on the straight run
+    (vertical moves) or on the vertical scan from a cell of the run (horizontal moves).
+    """
+    x, y = divmod(current, height)
+    reach = run[direction][current]
+    distance = jump[direction][current]
+    if direction & 1:  # down / up
+        if x == goal_x:
+            to_goal = goal_y - y if direction == 1 else y - goal_y
+            if 0 < to_goal <= reach and (distance == 0 or to_goal <= distance):
+                return to_goal
+        return distance
+    to_goal = goal_x - x if direction == 0 else x - goal_x
+    if 0 < to_goal <= reach and (distance == 0 or to_goal <= distance):
+        if y == goal_y:
+            return to_goal
+        column_cell = current + to_goal * (height if direction == 0 else -height)
+        if goal_y > y and goal_y - y <= run[1][column_cell]:
+            return to_goal
+        if goal_y < y and y - goal_y <= run[3][column_cell]:
+            return to_goal
+    return distance
+
+
+@measure_performance
+def jps(maze, start, goal):
+    """Jump Point Search (JPS+) on the 4-connected grid
+
+    Only jump points go through the heap; the straight runs between them are
+    read from the maze's precomputed jump tables. Same path length as A*, the
+    path is expanded back to single steps. Jumps assume every step costs the
+    same, so weighted terrain is searched with plain A*. So is a MazeOverlay:
+    its blocked cells move jump points all over the grid, and rebuilding the
+    tables per overlay costs more than the whole A* search.
+    """
+    if maze.weighted or isinstance(maze, MazeOverlay):
+        return a_star.__wrapped__(maze, start, goal)
+    run, jump = maze.jump_tables()
+    mask = maze.neighbor_mask
+    height = maze.height
+    offsets = (height, 1, -height, -1)  # DIRECTIONS as flat index steps
+    goal_x, goal_y = goal
+    start, goal = maze.index(start), maze.index(goal)
+    parent = [UNVISITED] * len(mask)
+    cost = [UNVISITED] * len(mask)
+    came_from = [UNVISITED] * len(mask)  # Direction each jump point was reached in
+    parent[start] = start
+    cost[start] = 0
+    heap = [(0, 0, start)]  # (f, h, cell)
+    expanded_nodes = 0
+    frontier_peak = visited_count = 1
+
+    while heap:
+        f, h, current = heapq.heappop(heap)
+        current_cost = cost[current]
+        if f - h > current_cost:
+            continue  # Stale entry
+        # trace: expand(current)
+        expanded_nodes += 1
+
+        if current == goal:
+            break
+
+        # Pruned successors: straight on, plus both verticals after a horizontal
+        # move or the forced horizontals after a vertical one
+        direction = came_from[current]
+        if direction == UNVISITED:
+            directions = (0, 1, 2, 3)
+        elif direction & 1 == 0:
+            directions = (direction, 1, 3)
+        else:
+            previous = mask[current - offsets[direction]]
+            directions = [direction] + [
+                side for side in (0, 2) if mask[current] >> side & 1 and not previous >> side & 1
+            ]
+
+        for direction in directions:
+            distance = _jump(run, jump, height, current, direction, goal_x, goal_y)
+            if not distance:
+                continue
+            neighbor = current + distance * offsets[direction]
+            new_cost = current_cost + distance
+            old_cost = cost[neighbor]
+            if old_cost == UNVISITED or new_cost < old_cost:
+                if old_cost == UNVISITED:
+                    # trace: discover(neighbor)
+                    visited_count += 1
+                parent[neighbor] = current
+                cost[neighbor] = new_cost
+                came_from[neighbor] = direction
+                x, y = divmod(neighbor, height)
+                h = abs(x - goal_x) + abs(y - goal_y)
+                heapq.heappush(heap, (new_cost + h, h, neighbor))
+        if len(heap) > frontier_peak:
+            frontier_peak = len(heap)
+
+    if parent[goal] == UNVISITED:
+        return [], expanded_nodes, frontier_peak, visited_count
+
+    # Fill in the straight runs between consecutive jump points
+    path = []
+    current = goal
+    while current != start:
+        previous = parent[current]
+        step = height if abs(current - previous) >= height else 1
+        if current < previous:
+            step = -step
+        while current != previous:
+            path.append(maze.position(current))
+            current -= step
+    path.reverse()
+    return path, expanded_nodes, frontier_peak, visited_count
+
+
+ALGORITHMS = {
+    "BFS": bfs,
+    "DFS": dfs,
+    "UCS": ucs,
+    "Astar": a_star,
+    "JPS": jps,
+    "BiBFS": bidirectional_bfs,
+    "BiAstar": bidirectional_a_star,
+    "HPA": hpa_star,
+}
+
+search_algorithms.SHORTEST_PATH_SEARCHES.update({bfs, ucs, a_star, jps, bidirectional_bfs, bidirectional_a_star})
+# Search backends an algorithm name can run on. JPS, the bidirectional searches
+# and HPA* only exist on flat indices, so "dict" falls back to the array functions
+BACKENDS = {
+    "dict": {**ALGORITHMS, **search_algorithms.ALGORITHMS},
+    "array": ALGORITHMS,
+}
+
+
+def engine_of(search):
+    """Backend whose own implementation `search` is ("dict" or "array")"""
+    return "dict" if search in search_algorithms.ALGORITHMS.values() else "array"
+
+
+class DistanceField:
+    """Reverse BFS distances from one source (Pac-Man), shared by every ghost heading there.
+
+    update() searches only when the source moved or a target cell is not yet
+    labelled, and stops once every target has its distance.
+    """
+
+    def __init__(self, maze):
+        self.maze = maze
+        self.maze_key = maze.cache_key()
+        self.source = None
+        self.dist = [UNVISITED] * len(maze.neighbor_mask)
+        self.queue = deque()
+        self.expanded_nodes = 0
+
+    def update(self, source, targets=()):
+        """Make the field current for `source`; returns the nodes expanded by this call"""
+        maze = self.maze
+        dist = self.dist
+        # Targets cut off from the source would make the BFS flood its whole component
+        targets = [maze.index(target) for target in targets if maze.reachable(target, source)]
+        source = maze.index(source)
+        if source != self.source or maze.cache_key() != self.maze_key:
+            self.maze_key = maze.cache_key()
+            self.source = source
+            dist = self.dist = [UNVISITED] * len(dist)
+            dist[source] = 0
+            self.queue = deque([source])
+
+        pending = sum(1 for target in set(targets) if dist[target] == UNVISITED)
+        if not pending:
+            return 0
+
+        # Resume the paused BFS until every target is labelled
+        mask, steps, queue = maze.neighbor_mask, maze.mask_offsets, self.queue
+        targets = set(targets)
+        expanded_nodes = 0
+        while queue and pending:
+            current = queue.popleft()
+            expanded_nodes += 1
+            new_dist = dist[current] + 1
+            for step in steps[mask[current]]:
+                neighbor = current + step
+                if dist[neighbor] == UNVISITED:
+                    dist[neighbor] = new_dist
+                    queue.append(neighbor)
+                    if neighbor in targets:
+                        pending -= 1
+        self.expanded_nodes += expanded_nodes
+        return expanded_nodes
+
+    def distance(self, position):
+        """Steps from position to the source, or -1 if unknown/unreachable"""
+        return self.dist[self.maze.index(position)]
+
+    def path_from(self, position, blocked=()):
+        """Shortest path from position to the source (position excluded), avoiding `blocked`"""
+        maze, dist = self.maze, self.dist
+        mask, steps = maze.neighbor_mask, maze.mask_offsets
+        blocked = {maze.index(cell) for cell in blocked}
+        current = maze.index(position)
+        if dist[current] == UNVISITED:
+            return []
+        path = []
+        while current != self.source:
+            target = dist[current] - 1
+            for step in steps[mask[current]]:
+                neighbor = current + step
+                if dist[neighbor] == target and neighbor not in blocked:
+                    break
+            else:
+                return []
+            current = neighbor
+            path.append(maze.position(current))
+        return path
+
+
+class SlicedSearch:
+    """A* that can be spread over several ticks with a node budget per call (anytime planning).
+
+    The search runs backwards, from the goal to the start, so when it reaches
+    the start every parent pointer is the next step towards the goal: moves()
+    streams the path from the first step on, without building or reversing a
+    list, and can start from any cell the search reached (a walker that moved
+    on while the search ran). With weighted=False every step costs 1 (BFS on terrain).
+    """
+
+    def __init__(self, maze, start, goal, weighted=True, name="sliced_search"):
+        self.maze = maze
+        self.start_position, self.goal_position = start, goal
+        self.weighted = weighted
+        self.name = name  # Algorithm name in the profiler record
+        self.restart()
+
+    def restart(self):
+        maze = self.maze
+        size = len(maze.neighbor_mask)
+        self.maze_key = maze.cache_key()
+        self.start, self.goal = maze.index(self.start_position), maze.index(self.goal_position)
+        self.costs = maze.step_costs if self.weighted else b"\x01" * size
+        self.scale = maze.min_step_cost if self.weighted else 1
+        self.parent = [UNVISITED] * size
+        self.cost = [UNVISITED] * size
+        self.closed = bytearray(size)
+        self.parent[self.goal] = self.goal
+        self.cost[self.goal] = 0
+        self.heap = [(0, 0, self.goal)]  # (f, h, cell), as in a_star
+        self.done = not maze.reachable(self.start_position, self.goal_position)  # Nothing to search
+        self.expanded_nodes = 0
+        self.frontier_peak = self.visited_count = 1
+        self.wall_ns = 0
+
+    def advance(self, budget):
+        """Expand at most `budget` nodes; returns True once the search has finished"""
+        if self.done:
+            return True
+        if self.maze.cache_key() != self.maze_key:
+            self.restart()  # The maze changed under a paused search
+        start_ns = perf_counter_ns()
+        mask, steps, costs = self.maze.neighbor_mask, self.maze.mask_offsets, self.costs
+        height, scale = self.maze.height, self.scale
+        parent, cost, closed, heap = self.parent, self.cost, self.closed, self.heap
+        start_x, start_y = self.start_position
+        expanded_nodes = 0
+
+        while heap and expanded_nodes < budget:
+            _, _, current = heapq.heappop(heap)
+            if closed[current]:
+                continue
+            closed[current] = 1
+            expanded_nodes += 1
+
+            if current == self.start:
+                heap.clear()
+                break
+
+            # Backwards: stepping from neighbor into current costs current's cost
+            new_cost = cost[current] + costs[current]
+            for step in steps[mask[current]]:
+                neighbor = current + step
+                if closed[neighbor]:
+                    continue
+                old_cost = cost[neighbor]
+                if old_cost == UNVISITED or new_cost < old_cost:
+                    if old_cost == UNVISITED:
+                        self.visited_count += 1
+                    x, y = divmod(neighbor, height)
+                    h = scale * (abs(x - start_x) + abs(y - start_y))
+                    parent[neighbor] = current
+                    cost[neighbor] = new_cost
+                    heapq.heappush(heap, (new_cost + h, h, neighbor))
+            if len(heap) > self.frontier_peak:
+                self.frontier_peak = len(heap)
+
+        self.expanded_nodes += expanded_nodes
+        self.done = not heap
+        self.wall_ns += perf_counter_ns() - start_ns
+        return self.done
+
+    def moves(self, position=None):
+        """Yield the path cells from the first step to the goal, from the start or from `position`
+
+        Yields nothing if there is no path or the search never reached `position`.
+        """
+        parent = self.parent
+        current = self.start if position is None else self.maze.index(position)
+        if not self.done or parent[current] == UNVISITED:
+            return
+        while current != self.goal:
+            current = parent[current]
+            yield self.maze.position(current)
+
+    def result(self, position=None):
+        """(path deque, expanded_nodes, search_time, memory_kb) of the finished search, like a decorated search
+
+        The path starts from `position` if given (see moves()). The record goes
+        to the profiler as usual; memory is not measured across slices.
+        """
+        path = deque(self.moves(position))
+        if profiler.mode != OFF:
+            profiler.records.append(SearchRecord(
+                self.name, self.expanded_nodes, self.frontier_peak, self.visited_count, self.wall_ns, 0.0, len(path)
+            ))
+        return path, self.expanded_nodes, self.wall_ns / 1e9, 0.0
@@ -0,0 +1,464 @@
+# Source\hierarchy.py
+"""Hierarchical pathfinding (HPA*) over fixed-size clusters of a Maze.
+
+The grid is cut into square clusters. Wherever two neighbouring clusters
+touch through open cells an entrance is placed (one transition per short
+opening, one at each end of a long one), and the distances between the
+entrances of each cluster are precomputed. A query only searches this small
+abstract graph plus the clusters of its endpoints; the cell-level path is
+refined leg by leg, on demand when the caller asks for a lazy path. On a
+MazeOverlay the base maze's graph is searched and the refined path detours
+around the temporarily blocked cells with small A* searches.
+"""
+from collections import deque
+import heapq
+from constants import HPA_CLUSTER_SIZE
+from search_algorithms import measure_performance
+
+LONG_ENTRANCE = 6  # Openings at least this wide get a transition at both ends
+
+
+class ClusterGraph:
+    """Abstract graph of one maze: per-cluster entrances and the distances between them
+
+    Clusters are numbered like cells, column by column (cx * clusters_y + cy).
+    mark_dirty() (called by Maze.tag) only queues a cluster; update() rebuilds
+    the queued clusters' borders and the intra-cluster distances of every
+    cluster whose entrances actually changed.
+    """
+
+    def __init__(self, maze, cluster_size=HPA_CLUSTER_SIZE):
+        self.maze = maze
+        self.cluster_size = cluster_size
+        self.clusters_x = -(-maze.width // cluster_size)
+        self.clusters_y = -(-maze.height // cluster_size)
+        count = self.clusters_x * self.clusters_y
+        self.borders = {}  # (cluster, 0 = east / 1 = south border) -> [(cell inside, cell across)]
+        self.entrances = [() for _ in range(count)]  # Sorted entrance cells per cluster
+        self.links = [{} for _ in range(count)]  # entrance -> cells across the border it leads to
+        self.edges = [{} for _ in range(count)]  # entrance -> [(other entrance, distance)]
+        self.adjacency = {}  # entrance -> [(abstract neighbor, cost)], intra edges and border crossings
+        # neighbor_mask without the bits that cross a cluster border, so the
+        # searches inside a cluster need no bounds checks
+        self.inner_mask = bytearray(len(maze.neighbor_mask))
+        self.dirty = set(range(count))
+        self.rebuilt_clusters = 0  # Intra-cluster rebuilds so far (for profiling)
+
+    def cluster_of(self, cell):
+        x, y = divmod(cell, self.maze.height)
+        return x // self.cluster_size * self.clusters_y + y // self.cluster_size
+
+    def bounds(self, cluster):
+        """(x0, x1, y0, y1) cell range of a cluster, upper bounds exclusive"""
+        cx, cy = divmod(cluster, self.clusters_y)
+        size = self.cluster_size
+        return (cx * size, min(cx * size + size, self.maze.width),
+                cy * size, min(cy * size + size, self.maze.height))
+
+    def mark_dirty(self, x, y):
+        self.dirty.add(x // self.cluster_size * self.clusters_y + y // self.cluster_size)
+
+    def update(self):
+        """Rebuild everything mark_dirty() queued since the last call"""
+        if not self.dirty:
+            return
+        dirty, self.dirty = self.dirty, set()
+        touched = set(dirty)
+        for cluster in dirty:
+            self._copy_inner_mask(cluster)
+        for cluster in dirty:
+            for owner, axis in self._borders_of(cluster):
+                self.borders[owner, axis] = self._find_transitions(owner, axis)
+                touched.add(owner)
+                touched.add(owner + (self.clusters_y if axis == 0 else 1))
+
+        for cluster in touched:
+            links = {}
+            for owner, axis in self._borders_of(cluster):
+                inside = 0 if owner == cluster else 1
+                for pair in self.borders[owner, axis]:
+                    links.setdefault(pair[inside], []).append(pair[1 - inside])
+            entrances = tuple(sorted(links))
+            self.links[cluster] = links
+            if cluster in dirty or entrances != self.entrances[cluster]:
+                for entrance in self.entrances[cluster]:
+                    self.adjacency.pop(entrance, None)
+                self.entrances[cluster] = entrances
+                edges = {}
+                for entrance in entrances:
+                    dist, _ = self.distances(entrance)
+                    edges[entrance] = [(other, dist[other]) for other in entrances
+                                       if other != entrance and other in dist]
+                self.edges[cluster] = edges
+                self.rebuilt_clusters += 1
+            costs = self.maze.step_costs
+            for entrance in entrances:
+                self.adjacency[entrance] = self.edges[cluster][entrance] + [
+                    (cell, costs[cell]) for cell in links[entrance]]
+
+    def _copy_inner_mask(self, cluster):
+        """Refresh a cluster's part of inner_mask from the maze, dropping the border-crossing bits"""
+        mask, inner, height = self.maze.neighbor_mask, self.inner_mask, self.maze.height
+        x0, x1, y0, y1 = self.bounds(cluster)
+        for x in range(x0, x1):
+            top, bottom = x * height + y0, x * height + y1
+            inner[top:bottom] = mask[top:bottom]
+            inner[top] &= 0b0111  # No step up out of the cluster
+            inner[bottom - 1] &= 0b1101  # ... nor down
+        for y in range(y0, y1):
+            inner[x0 * height + y] &= 0b1011  # ... nor left
+            inner[(x1 - 1) * height + y] &= 0b1110  # ... nor right
+
+    def _borders_of(self, cluster):
+        """Keys of the borders around a cluster; each is stored under its west/north cluster"""
+        cx, cy = divmod(cluster, self.clusters_y)
+        borders = []
+        if cx + 1 < self.clusters_x:
+            borders.append((cluster, 0))
+        if cy + 1 < self.clusters_y:
+            borders.append((cluster, 1))
+        if cx > 0:
+            borders.append((cluster - self.clusters_y, 0))
+        if cy > 0:
+            borders.append((cluster - 1, 1))
+        return borders
+
+    def _find_transitions(self, cluster, axis):
+        """Transitions across the east (axis 0) or south (axis 1) border of a cluster"""
+        maze = self.maze
+        mask, height = maze.neighbor_mask, maze.height
+        x0, x1, y0, y1 = self.bounds(cluster)
+        if axis == 0:
+            across, forward, backward = height, 1, 4
+            cells = [(x1 - 1) * height + y for y in range(y0, y1)]
+        else:
+            across, forward, backward = 1, 2, 8
+            cells = [x * height + y1 - 1 for x in range(x0, x1)]
+        transitions = []
+        run = []
+        for cell in cells + [None]:
+            if cell is not None and mask[cell] & forward and mask[cell + across] & backward:
+                run.append(cell)
+                continue
+            if len(run) >= LONG_ENTRANCE:
+                transitions += [(run[0], run[0] + across), (run[-1], run[-1] + across)]
+            elif run:
+                middle = run[len(run) // 2]
+                transitions.append((middle, middle + across))
+            run = []
+        return transitions
+
+    def distances(self, source, reverse=False):
+        """Cheapest costs from `source` to the cells of its cluster without leaving it
+
+        Returns ({cell: cost}, [expanded cells in order]). With reverse=True the
+        costs are from each cell to `source` (a move pays the cell it enters).
+        """
+        maze = self.maze
+        mask, steps, costs = self.inner_mask, maze.mask_offsets, maze.step_costs
+        dist = {source: 0}
+        closed = set()
+        expanded = []
+        heap = [(0, source)]
+        while heap:
+            cost, current = heapq.heappop(heap)
+            if current in closed:
+                continue
+            closed.add(current)
+            expanded.append(current)
+            step_cost = costs[current] if reverse else 0
+            for step in steps[mask[current]]:
+                neighbor = current + step
+                if neighbor in closed:
+                    continue
+                new_cost = cost + (step_cost if reverse else costs[neighbor])
+                if new_cost < dist.get(neighbor, new_cost + 1):
+                    dist[neighbor] = new_cost
+                    heapq.heappush(heap, (new_cost, neighbor))
+        return dist, expanded
+
+    def local_path(self, start, goal):
+        """Cheapest cell path from start to goal inside start's cluster (start excluded), or None"""
+        maze = self.maze
+        mask, steps, costs, height = self.inner_mask, maze.mask_offsets, maze.step_costs, maze.height
+        goal_x, goal_y = divmod(goal, height)
+        scale = maze.min_step_cost
+        parent = {start: None}
+        g = {start: 0}
+        closed = set()
+        heap = [(0, start)]
+        while heap:
+            _, current = heapq.heappop(heap)
+            if current == goal:
+                path = []
+                while current != start:
+                    path.append(maze.position(current))
+                    current = parent[current]
+                path.reverse()
+                return path
+            if current in closed:
+                continue
+            closed.add(current)
+            for step in steps[mask[current]]:
+                neighbor = current + step
+                if neighbor in closed:
+                    continue
+                new_cost = g[current] + costs[neighbor]
+                if new_cost < g.get(neighbor, new_cost + 1):
+                    g[neighbor] = new_cost
+                    parent[neighbor] = current
+                    x, y = divmod(neighbor, height)
+                    h = (abs(x - goal_x) + abs(y - goal_y)) * scale
+                    heapq.heappush(heap, (new_cost + h, neighbor))
+        return None
+
+    def refine(self, waypoints):
+        """Yield the cell path between consecutive abstract waypoints, one leg at a time
+
+        Stops early if a leg can no longer be refined (the maze changed meanwhile).
+        """
+        for current, following in zip(waypoints, waypoints[1:]):
+            if self.cluster_of(current) != self.cluster_of(following):
+                yield [self.maze.position(following)]  # Step across a border
+                continue
+            leg = self.local_path(current, following)
+            if leg is None:
+                return
+            yield leg
+
+
+class LazyPath(deque):
+    """A path whose later legs are refined only when the walker gets to them
+
+    Behaves like the refined prefix of the path; popleft() pulls the next leg
+    in as soon as the prefix runs out, so the deque is empty only at the goal.
+    """
+
+    def __init__(self, legs):
+        super().__init__()
+        self.legs = legs
+        self._refill()
+
+    def _refill(self):
+        while not self and self.legs is not None:
+            self.pull_leg()
+
+    def pull_leg(self):
+        """Append the next refined leg; False once there is none left"""
+        leg = next(self.legs, None) if self.legs is not None else None
+        if leg is None:
+            self.legs = None
+            return False
+        self.extend(leg)
+        return True
+
+    def popleft(self):
+        position = super().popleft()
+        self._refill()
+        return position
+
+
+def _rejoin(maze, sources, rejoin, rest, goal):
+    """A* from the path's free prefix back onto its suffix, on maze's own neighbor mask
+
+    sources maps prefix cells to their cost from the start, rejoin maps suffix
+    cells to their path index and rest[index] is the cost of following the path
+    from there, so the search finds the cheapest way to leave and rejoin it
+    (the neighbor mask of an overlay leaves out its blocked cells). Returns
+    (source cell, positions after it up to the rejoined cell, its index,
+    expanded cells in order); all but the expanded cells are None if cut off.
+    """
+    mask, steps, costs, height = maze.neighbor_mask, maze.mask_offsets, maze.step_costs, maze.height
+    goal_x, goal_y = divmod(goal, height)
+    scale = maze.min_step_cost
+    parent = dict.fromkeys(sources)
+    g = dict(sources)
+    closed = set()
+    expanded = []
+    heap = []  # (f, tie, cell, rejoined): a finished route wins ties
+    for cell, cost in sources.items():
+        x, y = divmod(cell, height)
+        h = (abs(x - goal_x) + abs(y - goal_y)) * scale
+        heap.append((cost + h, h, cell, False))
+    heapq.heapify(heap)
+    while heap:
+        _, _, current, rejoined = heapq.heappop(heap)
+        if rejoined:
+            index = rejoin[current]
+            path = []
+            while parent[current] is not None:
+                path.append(maze.position(current))
+                current = parent[current]
+            path.reverse()
+            return current, path, index, expanded
+        if current in closed:
+            continue
+        closed.add(current)
+        expanded.append(current)
+        if current in rejoin:
+            heapq.heappush(heap, (g[current] + rest[rejoin[current]], -1, current, True))
+        for step in steps[mask[current]]:
+            neighbor = current + step
+            if neighbor in closed:
+                continue
+            new_cost = g[current] + costs[neighbor]
+            if new_cost < g.get(neighbor, new_cost + 1):
+                g[neighbor] = new_cost
+                parent[neighbor] = current
+                x, y = divmod(neighbor, height)
+                h = (abs(x - goal_x) + abs(y - goal_y)) * scale
+                heapq.heappush(heap, (new_cost + h, h, neighbor, False))
+    return None, None, None, expanded
+
+
+def _avoid_blocked(maze, start, goal, path, blocked, window):
+    """Route `path` around the blocked cells on it; returns (new path, expanded cells)
+
+    At each blocked run an A* search leaves the path from one of the last
+    `window` cells before it and rejoins it at whichever later free cell (or
+    the goal, for a partial path) gives the cheapest route, then the path is
+    followed again from there.
+    """
+    costs, height, scale = maze.step_costs, maze.height, maze.min_step_cost
+    cells = [maze.index(position) for position in path]
+    # rest[k]: cost of following the path from cells[k] to its end, plus a
+    # Manhattan estimate to the goal when the path is only a lazy prefix
+    end_x, end_y = divmod(cells[-1], height)
+    goal_x, goal_y = divmod(goal, height)
+    rest = [0] * (len(cells) + 1)  # rest[len(cells)] stands for the goal itself
+    rest[-2] = scale * (abs(end_x - goal_x) + abs(end_y - goal_y))
+    for k in range(len(cells) - 2, -1, -1):
+        rest[k] = rest[k + 1] + costs[cells[k + 1]]
+
+    repaired, expanded = [], []
+    sources = {start: 0}  # Free cells walked so far -> cost from start
+    slots = {start: 0}  # ... -> length of repaired when they were walked
+    cost, i = 0, 0
+    while i < len(cells):
+        if cells[i] not in blocked:
+            repaired.append(path[i])
+            cost += costs[cells[i]]
+            sources.setdefault(cells[i], cost)
+            slots.setdefault(cells[i], len(repaired))
+            i += 1
+            continue
+        rejoin = {cells[k]: k for k in range(i + 1, len(cells)) if cells[k] not in blocked}
+        rejoin.setdefault(goal, len(cells))
+        near = {cell: g for cell, g in sources.items() if slots[cell] >= len(repaired) - window}
+        source, detour, index, searched = _rejoin(maze, near, rejoin, rest, goal)
+        expanded += searched
+        if detour is None:
+            return [], expanded
+        del repaired[slots[source]:]
+        cost = sources[source]
+        kept = [cell for cell in sources if slots[cell] <= slots[source]]
+        sources = {cell: sources[cell] for cell in kept}
+        slots = {cell: slots[cell] for cell in kept}
+        for position in detour:
+            cell = maze.index(position)
+            repaired.append(position)
+            cost += costs[cell]
+            sources.setdefault(cell, cost)
+            slots.setdefault(cell, len(repaired))
+        i = index + 1
+    return repaired, expanded
+
+
+@measure_performance
+def hpa_star(maze, start, goal, lazy=False):
+    """HPA*: A* over the maze's cluster graph, then refinement inside each cluster
+
+    The path is near-optimal (it passes through entrance cells). With lazy=True
+    the path is a LazyPath and only its first leg has been searched.
+    """
+    graph = maze.cluster_graph()
+    graph.update()
+    costs, height = maze.step_costs, maze.height
+    start, goal = maze.index(start), maze.index(goal)
+    if start == goal:
+        return [], 0, 0, 1
+    # MazeOverlay: the graph ignores the blocked cells, the refined path detours around them
+    blocked = getattr(maze, "blocked", None)
+    if blocked and maze.position(goal) in blocked:
+        return [], 0, 0, 1
+
+    # Connect start and goal to the entrances of their clusters
+    start_cluster, goal_cluster = graph.cluster_of(start), graph.cluster_of(goal)
+    from_start, start_expanded = graph.distances(start)
+    to_goal, goal_expanded = graph.distances(goal, reverse=True)
+    # trace: expand_all(start_expanded)
+    # trace: expand_all(goal_expanded)
+    expanded_nodes = len(start_expanded) + len(goal_expanded)
+    start_edges = [(entrance, from_start[entrance]) for entrance in graph.entrances[start_cluster]
+                   if entrance in from_start and entrance != start]
+    start_edges += [(cell, costs[cell]) for cell in graph.links[start_cluster].get(start, ())]
+    if start_cluster == goal_cluster and goal in from_start:
+        start_edges.append((goal, from_start[goal]))
+    goal_edges = {entrance: to_goal[entrance] for entrance in graph.entrances[goal_cluster]
+                  if entrance in to_goal and entrance != goal}
+    adjacency = graph.adjacency
+
+    goal_x, goal_y = divmod(goal, height)
+    scale = maze.min_step_cost
+    parent = {start: None}
+    g = {start: 0}
+    closed = set()
+    heap = [(0, 0, start)]  # (f, -g, cell): ties on f go to the deeper node, the graph has many equal-f routes
+    frontier_peak = 1
+    visited_count = 1
+    found = False
+    while heap:
+        _, cost, current = heapq.heappop(heap)
+        cost = -cost
+        if current == goal:
+            found = True
+            break
+        if current in closed:
+            continue
+        closed.add(current)
+        # trace: expand(current)
+        expanded_nodes += 1
+
+        neighbors = start_edges if current == start else adjacency.get(current, ())
+        if current in goal_edges:
+            neighbors = [*neighbors, (goal, goal_edges[current])]
+        for neighbor, step_cost in neighbors:
+            if neighbor in closed:
+                continue
+            new_cost = cost + step_cost
+            if new_cost < g.get(neighbor, new_cost + 1):
+                if neighbor not in g:
+                    # trace: discover(neighbor)
+                    visited_count += 1
+                g[neighbor] = new_cost
+                parent[neighbor] = current
+                x, y = divmod(neighbor, height)
+                heapq.heappush(heap, (new_cost + (abs(x - goal_x) + abs(y - goal_y)) * scale, -new_cost, neighbor))
+        frontier_peak = max(frontier_peak, len(heap))
+
+    if not found:
+        return [], expanded_nodes, frontier_peak, visited_count
+    waypoints = [goal]
+    while parent[waypoints[-1]] is not None:
+        waypoints.append(parent[waypoints[-1]])
+    waypoints.reverse()
+    legs = graph.refine(waypoints)
+    path = LazyPath(legs) if lazy else [position for leg in legs for position in leg]
+
+    # A lazy path only detours on its refined part and meets later blocked cells in its next replans
+    if blocked and path:
+        blocked = {maze.index(position) for position in blocked}
+        if lazy:
+            while maze.index(path[-1]) in blocked and path.pull_leg():
+                pass
+        repaired, detour_expanded = _avoid_blocked(maze, start, goal, list(path), blocked, graph.cluster_size)
+        # trace: expand_all(detour_expanded)
+        expanded_nodes += len(detour_expanded)
+        if not lazy:
+            path = repaired
+        else:
+            path.clear()
+            path.extend(repaired)
+            if not repaired or maze.index(repaired[-1]) == goal:
+                path.legs = None
+    return path, expanded_nodes, frontier_peak, visited_count
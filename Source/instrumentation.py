@@ -0,0 +1,95 @@
+# Source\instrumentation.py
+"""Search instrumentation with selectable overhead.
+
+Modes:
+    OFF      - no timing, no records; searches run bare
+    COUNTERS - perf_counter_ns wall time plus the search's own counters
+    MEMORY   - COUNTERS plus tracemalloc peak memory (slow, for analysis only)
+"""
+from collections import deque, namedtuple
+import json
+from time import perf_counter_ns
+import tracemalloc
+from constants import INSTRUMENTATION_MODE, INSTRUMENTATION_CAPACITY
+
+OFF = "off"
+COUNTERS = "counters"
+MEMORY = "memory"
+MODES = (OFF, COUNTERS, MEMORY)
+
+SearchRecord = namedtuple(
+    "SearchRecord",
+    ["algorithm", "expanded_nodes", "frontier_peak", "visited_count", "wall_ns", "memory_kb", "path_length", "cached"],
+    defaults=(False,),
+)
+
+
+class Instrumentation:
+    def __init__(self, mode=COUNTERS, capacity=1024):
+        self.set_mode(mode)
+        self.records = deque(maxlen=capacity)  # Ring buffer of SearchRecord
+
+    def set_mode(self, mode):
+        if mode not in MODES:
+            raise ValueError(f"Unknown instrumentation mode: {mode!r} (expected one of {MODES})")
+        self.mode = mode
+
+    def measure(self, func, maze, start, goal, *args, **kwargs):
+        """Run one search and return (path, expanded_nodes, search_time, memory_kb)"""
+        mode = self.mode
+        if mode == OFF:
+            path, expanded_nodes, _, _ = func(maze, start, goal, *args, **kwargs)
+            return path, expanded_nodes, 0.0, 0.0
+
+        if mode == MEMORY:
+            tracemalloc.start()
+        start_ns = perf_counter_ns()
+        path, expanded_nodes, frontier_peak, visited_count = func(maze, start, goal, *args, **kwargs)
+        wall_ns = perf_counter_ns() - start_ns
+        memory_kb = 0.0
+        if mode == MEMORY:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            memory_kb = peak / 1024
+
+        self.records.append(SearchRecord(
+            func.__name__, expanded_nodes, frontier_peak, visited_count, wall_ns, memory_kb, len(path)
+        ))
+        return path, expanded_nodes, wall_ns / 1e9, memory_kb
+
+    def last(self):
+        """Most recent record, or None"""
+        return self.records[-1] if self.records else None
+
+    def recent(self, count=None):
+        """The newest `count` records (all buffered records by default), oldest first"""
+        if count is None or count >= len(self.records):
+            return list(self.records)
+        return list(self.records)[-count:]
+
+    def summary(self, records=None):
+        """Aggregate totals and peaks over the given records (default: the whole buffer)"""
+        records = self.recent() if records is None else list(records)
+        if not records:
+            return {"searches": 0}
+        return {
+            "searches": len(records),
+            "expanded_nodes": sum(r.expanded_nodes for r in records),
+            "frontier_peak": max(r.frontier_peak for r in records),
+            "visited_peak": max(r.visited_count for r in records),
+            "wall_ms": sum(r.wall_ns for r in records) / 1e6,
+            "memory_peak_kb": max(r.memory_kb for r in records),
+            "cache_hit_rate": sum(1 for r in records if r.cached) / len(records),
+        }
+
+    def clear(self):
+        self.records.clear()
+
+
+def append_metrics(path, metrics):
+    """Append one metrics dict to a JSON lines file"""
+    with open(path, "a") as stream:
+        stream.write(json.dumps(metrics) + "\n")
+
+
+profiler = Instrumentation(INSTRUMENTATION_MODE, INSTRUMENTATION_CAPACITY)
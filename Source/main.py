@@ -2,19 +2,67 @@
 import sys
 import argparse
 from constants import *
-from runtime import PygameRuntime
 
 # Initialize pygame
 # pygame.init()
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Pac-Man Search Algorithms')
-    parser.add_argument('--algorithm', type=str, nargs='+', choices=['BFS', 'DFS', 'UCS', 'Astar'], 
-                       default='Astar', help='Search algorithm to use (BFS, DFS, UCS , or Astar)')
+    parser.add_argument('--algorithm', type=str, nargs='+', choices=['BFS', 'DFS', 'UCS', 'Astar', 'JPS', 'BiBFS', 'BiAstar', 'HPA'], 
+                       default=None, help='Search algorithm to use (BFS, DFS, UCS, Astar, JPS, BiBFS, BiAstar or HPA)')
+
+    # Headless benchmark mode
+    parser.add_argument('--benchmark', action='store_true', help='Run the headless benchmark instead of the game')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[GRID_SIZE], help='Maze sizes (width = height) to benchmark')
+    parser.add_argument('--mazes', type=int, default=1, help='Number of mazes generated per size')
+    parser.add_argument('--queries', type=int, default=100, help='Start/goal pairs searched per maze')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the first maze (maze i uses seed + i)')
+    parser.add_argument('--backend', type=str, nargs='+', choices=['dict', 'array'], default=['dict'],
+                       help='Search backends to benchmark')
+    parser.add_argument('--maze-files', type=str, nargs='+', default=None,
+                       help='Benchmark mazes saved with Maze.save instead of generating them')
+    parser.add_argument('--save-mazes', type=str, default=None, help='Directory to save the generated mazes to')
+    parser.add_argument('--cache', type=int, default=0, help='Path cache entries (0 = no cache)')
+    parser.add_argument('--repeat', type=int, default=1, help='Replay the query list this many times')
+    parser.add_argument('--heuristic', type=str, choices=['manhattan', 'landmarks', 'table'], default='manhattan',
+                       help='A* heuristic precomputation')
+    parser.add_argument('--landmarks', type=int, default=LANDMARK_COUNT, help='Landmark count for --heuristic landmarks')
+    parser.add_argument('--terrain', action='store_true', help='Generate mazes with weighted slow zones')
+    parser.add_argument('--memory', action='store_true', help='Also measure peak memory with tracemalloc (slow)')
+    parser.add_argument('--format', type=str, choices=['csv', 'json'], default='csv', help='Benchmark output format')
+    parser.add_argument('--output', type=str, default=None, help='Benchmark output file (default: stdout)')
+
+    # Headless self-checks
+    parser.add_argument('--check', type=str, nargs='*', default=None,
+                       help='Run the headless self-checks (all, or only the named ones) instead of the game')
 
     return parser.parse_args()
 
+def run_benchmark(args):
+    from benchmark import run_benchmark, write_results
+
+    rows = run_benchmark(args.sizes, args.mazes, args.queries, args.seed,
+                         args.algorithm, args.backend, args.memory, args.maze_files, args.save_mazes,
+                         args.cache, args.repeat,
+                         None if args.heuristic == 'manhattan' else args.heuristic, args.landmarks,
+                         args.terrain)
+    if args.output:
+        with open(args.output, 'w', newline='') as stream:
+            write_results(rows, args.format, stream)
+    else:
+        write_results(rows, args.format)
+
 def main():
+    args = parse_arguments()
+    if args.check is not None:
+        from checks import run_checks
+        sys.exit(1 if run_checks(args.check) else 0)
+    if args.benchmark:
+        run_benchmark(args)
+        sys.exit()
+
+    # Chỉ nạp pygame khi chạy giao diện
+    from runtime import PygameRuntime
     game = PygameRuntime()
     game.run()
     # args = parse_arguments()
@@ -1,17 +1,122 @@
 # Source\maze.py
+from bisect import bisect_left
+from itertools import count
 import numpy as np
 import random
+from hierarchy import ClusterGraph, HPA_CLUSTER_SIZE
+
+# Các hướng theo thứ tự của get_neighbors: phải, xuống, trái, lên
+DIRECTIONS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+# Bit d của mặt nạ bật khi đi được theo DIRECTIONS[d]
+MASK_STEPS = [tuple(DIRECTIONS[d] for d in range(4) if mask >> d & 1) for mask in range(16)]
+MASK_BITS = (np.arange(16)[:, None] >> np.arange(4) & 1).astype(bool)  # MASK_BITS[mask, d] như trên, dạng mảng
+
+# Định dạng tệp mê cung: header cố định rồi tới các bit tường (1 bit/ô, theo hàng),
+# rồi (từ bản 2) chi phí từng ô
+MAZE_MAGIC = b"PMAZ"
+MAZE_FORMAT_VERSION = 2  # 2 = bản 1 cộng lớp chi phí (1 byte/ô) sau phần bit tường
+MAZE_HEADER = np.dtype([
+    ("magic", "S4"),
+    ("version", "<u2"),
+    ("header_size", "<u2"),
+    ("width", "<u4"),
+    ("height", "<u4"),
+    ("seed", "<i8"),  # -1 nếu không có seed
+])
+
+# Mã định danh duy nhất cho mỗi mê cung (dùng trong khóa cache)
+_maze_ids = count()
+
+def build_jump_tables(neighbor_mask, width, height):
+    """Bảng JPS+ cho lưới 4 hướng, theo thứ tự DIRECTIONS, mỗi bảng là list theo chỉ số phẳng
+
+    run[d][i]  : số bước đi thẳng được từ ô i theo hướng d trước khi gặp tường
+    jump[d][i] : khoảng cách tới jump point đầu tiên theo hướng d (0 nếu không có)
+
+    Đường chuẩn đi ngang trước: đi dọc chỉ dừng ở ô có hàng xóm ngang bị ép (ô ngang
+    cạnh ô trước đó là tường), đi ngang dừng ở ô mà từ đó đi dọc gặp jump point.
+    """
+    masks = np.frombuffer(bytes(neighbor_mask), dtype=np.uint8).reshape(width, height)
+    can = [(masks >> d & 1).astype(bool) for d in range(4)]  # can[d][x, y]: đi được theo hướng d
+    run = [np.zeros((width, height), dtype=np.int32) for _ in range(4)]
+    jump = [np.zeros((width, height), dtype=np.int32) for _ in range(4)]
+
+    # Dọc (xuống = 1, lên = 3): ô kế tiếp bị ép nếu nó đi ngang được mà ô hiện tại thì không
+    for d, rows in ((1, range(height - 2, -1, -1)), (3, range(1, height))):
+        step = 1 if d == 1 else -1
+        for y in rows:
+            ny = y + step
+            moving = can[d][:, y]
+            forced = (can[0][:, ny] & ~can[0][:, y]) | (can[2][:, ny] & ~can[2][:, y])
+            run[d][:, y] = np.where(moving, run[d][:, ny] + 1, 0)
+            after = jump[d][:, ny]
+            jump[d][:, y] = np.where(moving, np.where(forced, 1, np.where(after > 0, after + 1, 0)), 0)
+
+    # Ngang (phải = 0, trái = 2): ô kế tiếp là jump point nếu đi dọc từ nó gặp jump point
+    vertical = (jump[1] > 0) | (jump[3] > 0)
+    for d, columns in ((0, range(width - 2, -1, -1)), (2, range(1, width))):
+        step = 1 if d == 0 else -1
+        for x in columns:
+            nx = x + step
+            moving = can[d][x]
+            run[d][x] = np.where(moving, run[d][nx] + 1, 0)
+            after = jump[d][nx]
+            jump[d][x] = np.where(moving, np.where(vertical[nx], 1, np.where(after > 0, after + 1, 0)), 0)
+
+    return [table.ravel().tolist() for table in run], [table.ravel().tolist() for table in jump]
+
+
+def label_components(neighbor_mask, open_cells, height):
+    """Nhãn vùng liên thông (int32 theo chỉ số phẳng, 0..k-1, -1 cho tường)
+
+    Gán nhãn bằng NumPy: mỗi vòng nối gốc lớn hơn của hai đầu một cạnh vào gốc
+    nhỏ hơn rồi nhảy con trỏ tới khi mọi ô trỏ thẳng về gốc, chỉ giữ lại các
+    cạnh còn nối hai gốc khác nhau.
+    """
+    masks = np.frombuffer(neighbor_mask, dtype=np.uint8)
+    # Cạnh sang phải và xuống giữa hai ô mở (mỗi cạnh một lần)
+    right = np.flatnonzero(open_cells & (masks & 1 != 0))
+    down = np.flatnonzero(open_cells & (masks & 2 != 0))
+    a = np.concatenate([right, down])
+    b = np.concatenate([right + height, down + 1])
+    parent = np.arange(masks.size)
+    while a.size:
+        root_a, root_b = parent[a], parent[b]
+        apart = root_a != root_b
+        a, b, root_a, root_b = a[apart], b[apart], root_a[apart], root_b[apart]
+        np.minimum.at(parent, np.maximum(root_a, root_b), np.minimum(root_a, root_b))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+    # Đánh số lại các gốc 0..k-1 (gốc là ô trỏ về chính nó)
+    roots = (parent == np.arange(masks.size)) & open_cells
+    numbers = (np.cumsum(roots) - 1).astype(np.int32)
+    return np.where(open_cells, numbers[parent], -1).astype(np.int32)
+
+
+# Vùng đi chậm khi sinh địa hình: số ô trên mỗi vùng, cạnh vùng và chi phí lớn nhất
+TERRAIN_CELLS_PER_ZONE = 150
+TERRAIN_ZONE_SIZES = (2, 6)
+TERRAIN_MAX_COST = 5
+
+# Kích thước (rộng, cao) của các cụm tường; cả hai cạnh >= 3 thì thành chuồng
+CLUSTER_SIZES = [(5,3), (3,5), (2,2), (3,4), (4,3), (1,3), (3,1), (1,4), (4,1), (1,5), (5,1), (1,2), (2,1), (2,3), (3,2)]
 
 class Maze:
-    def __init__(self, width=20, height=20):
-        self.width = width
-        self.height = height
+    def __init__(self, width=20, height=20, vectorized=False, seed=None, terrain=False):
+        self._setup(width, height, seed)
         self.grid = np.zeros((height, width), dtype=int)
         self.tagged = np.zeros((height, width), dtype=int)
         
         # Tạo các bức tường cố định
         self.border()
-        self.generate()
+        if vectorized:
+            self.generate_vectorized(terrain=terrain)
+        else:
+            self.generate(terrain=terrain)
+        self.build_index()
 
         # # Tường ngang
         # for x in range(5, 15):
@@ -44,6 +149,84 @@ class Maze:
         #     if y != 12:
         #         self.grid[y][7] = 1
 
+    def _setup(self, width, height, seed):
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.uid = next(_maze_ids)
+        self.version = 0  # Tăng mỗi lần tag() đổi lưới
+        # Có seed thì dùng RNG riêng, không thì dùng module random toàn cục như trước
+        self.rng = random.Random(seed) if seed is not None else random
+        self.neighbor_mask = None
+        self.mask_offsets = [tuple((dx * height + dy) for dx, dy in steps) for steps in MASK_STEPS]
+        # Tiền xử lý cho heuristic của A* (precompute_landmarks / precompute_distance_table)
+        self.landmarks = []
+        self.landmark_distances = None
+        self.distance_table = None
+        self._bound_version = None
+        self._jump_tables = None  # (version, bảng) cho JPS+, xem jump_tables()
+        self._cluster_graph = None  # Đồ thị cụm cho HPA*, xem cluster_graph()
+        # Nhãn vùng liên thông theo chỉ số phẳng (xem component_labels); tag() cập nhật
+        # tại chỗ, chỉ tính lại cả lưới khi một ô thành tường có thể tách đôi một vùng
+        self._labels = None
+        self._next_label = 0
+        # Chi phí đi vào từng ô (uint8, >= 1); step_costs là bản phẳng theo chỉ số ô
+        self.costs = np.ones((height, width), dtype=np.uint8)
+        self.step_costs = b"\x01" * (width * height)
+        self.min_step_cost = self.max_step_cost = 1
+
+    @classmethod
+    def from_grid(cls, grid, seed=None, costs=None):
+        """Tạo mê cung từ một lưới có sẵn (không sinh ngẫu nhiên), có thể kèm lớp chi phí"""
+        height, width = grid.shape
+        maze = cls.__new__(cls)
+        maze._setup(width, height, seed)
+        maze.grid = grid
+        maze.tagged = np.zeros((height, width), dtype=np.uint8)
+        if costs is not None:
+            maze.set_costs(costs)
+        maze.build_index()
+        return maze
+
+    def save(self, path):
+        """Ghi mê cung ra tệp nhị phân: header + tường nén 1 bit/ô"""
+        header = np.zeros(1, dtype=MAZE_HEADER)
+        header["magic"] = MAZE_MAGIC
+        header["version"] = MAZE_FORMAT_VERSION
+        header["header_size"] = MAZE_HEADER.itemsize
+        header["width"] = self.width
+        header["height"] = self.height
+        header["seed"] = -1 if self.seed is None else self.seed
+        bits = np.packbits(np.asarray(self.grid, dtype=bool).ravel(), bitorder="little")
+        # Chi phí đều nhưng khác 1 (vd toàn 3) vẫn phải ghi: chỉ bỏ khi mọi ô đều có chi phí 1
+        has_costs = self.max_step_cost != 1
+        if not has_costs:
+            header["version"] = 1  # Không có địa hình: giữ định dạng cũ
+        with open(path, "wb") as f:
+            f.write(header.tobytes())
+            f.write(bits.tobytes())
+            if has_costs:
+                f.write(self.costs.tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """Đọc mê cung đã lưu bằng save(); phần bit tường được memmap, không đọc cả tệp vào bộ nhớ"""
+        header = np.fromfile(path, dtype=MAZE_HEADER, count=1)
+        if header.size != 1 or header["magic"][0] != MAZE_MAGIC:
+            raise ValueError(f"{path} is not a maze file")
+        version = header["version"][0]
+        if not 1 <= version <= MAZE_FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported maze format version {version}")
+        width, height = int(header["width"][0]), int(header["height"][0])
+        seed = int(header["seed"][0])
+        offset = int(header["header_size"][0])
+        bits = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=((width * height + 7) // 8,))
+        grid = np.unpackbits(bits, count=width * height, bitorder="little").reshape(height, width)
+        costs = None
+        if version >= 2:
+            costs = np.memmap(path, dtype=np.uint8, mode="r", offset=offset + bits.size, shape=(height, width))
+        return cls.from_grid(grid, None if seed < 0 else seed, costs)
+
     def border(self):
         """Tạo các tường bao quanh"""
         for x in range(self.width):
@@ -60,19 +243,125 @@ class Maze:
 
 
 
-    def generate(self):
-        """Tạo một mê cung ngẫu nhiên"""
+    def generate(self, terrain=False):
+        """Tạo một mê cung ngẫu nhiên; terrain=True thêm các vùng đi chậm (xem generate_terrain)"""
  
-        sizes = [(5,3), (3,5), (2,2), (3,4), (4,3), (1,3), (3,1), (1,4), (4,1), (1,5), (5,1), (1,2), (2,1), (2,3), (3,2)] 
+        sizes = CLUSTER_SIZES
         for i in range( 2, self.width - 2):
             for j in range(2, self.height - 2):
                 if self.tagged[j][i] == 0:
-                    size = random.choice(sizes)
+                    size = self.rng.choice(sizes)
                     if (size[0] >= 3 and size[1] >= 3):
                         self.generate_cage_cluster(i, j, size)
                     else:
                         self.generate_loop_cluster(i, j, size)
                     # self.generate_loop_cluster(i, j, size)
+        if terrain:
+            self.generate_terrain()
+
+    def generate_vectorized(self, rng=None, terrain=False):
+        """Tạo mê cung theo cùng quy tắc với generate() nhưng đóng dấu cả cột cụm một lúc bằng NumPy
+
+        Các cụm trong cùng một cột không chồng lên nhau nên chỉ cần quét vị trí bắt đầu
+        của chúng bằng Python; tường, lỗ và vùng đánh dấu được gán theo lô.
+        """
+        if rng is None:
+            rng = np.random.default_rng(self.rng.getrandbits(64))
+        width, height = self.width, self.height
+        sizes = np.array(CLUSTER_SIZES)
+        heights = sizes[:, 1].tolist()
+        # Khuôn 7x7 phủ cụm lớn nhất (5x5) cùng viền xung quanh
+        dx = np.arange(-1, 6)[None, :, None]
+        dy = np.arange(-1, 6)[None, None, :]
+
+        for i in range(2, width - 2):
+            free_rows = (np.flatnonzero(self.tagged[2:height - 2, i] == 0) + 2).tolist()
+            if not free_rows:
+                continue
+
+            # Quét dọc cột: cụm đặt tại j đánh dấu các hàng j-1 .. j+h của cột này
+            picks = rng.integers(len(sizes), size=len(free_rows))
+            starts, chosen = [], []
+            pos = 0
+            while pos < len(free_rows):
+                j = free_rows[pos]
+                pick = picks[len(starts)]
+                starts.append(j)
+                chosen.append(pick)
+                pos = bisect_left(free_rows, j + heights[pick] + 1, pos + 1)
+
+            y0 = np.array(starts)[:, None, None]
+            w = sizes[chosen, 0][:, None, None]
+            h = sizes[chosen, 1][:, None, None]
+            xs, ys = np.broadcast_arrays(i + dx, y0 + dy)
+            in_grid = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+            inner = (xs > 1) & (xs < width - 2) & (ys > 1) & (ys < height - 2)
+            body = (dx >= 0) & (dx < w) & (dy >= 0) & (dy < h)
+            ring = ~body & (dx <= w) & (dy <= h)
+            cage = (w >= 3) & (h >= 3)
+            edge = body & ((dx == 0) | (dx == w - 1) | (dy == 0) | (dy == h - 1))
+
+            walls = (cage & edge & in_grid) | (~cage & body & inner)
+            marked = walls | (cage & body & inner) | (ring & in_grid)
+            self.grid[ys[walls], xs[walls]] = 1
+            self.tagged[ys[marked], xs[marked]] = 1
+
+            # Lỗ trên thành chuồng: 1-4 lỗ, không nằm ở góc
+            cages = np.flatnonzero(cage.ravel())
+            if cages.size:
+                cw = w.ravel()[cages][:, None]
+                ch = h.ravel()[cages][:, None]
+                cy = y0.ravel()[cages][:, None]
+                count = rng.integers(1, 5, size=(cages.size, 1))
+                hole_x = i + (rng.random((cages.size, 4)) * cw).astype(int)
+                on_side = (hole_x == i) | (hole_x == i + cw - 1)
+                side_y = cy + 1 + (rng.random((cages.size, 4)) * (ch - 2)).astype(int)
+                cap_y = np.where(rng.random((cages.size, 4)) < 0.5, cy, cy + ch - 1)
+                hole_y = np.where(on_side, side_y, cap_y)
+                holes = ((np.arange(4) < count) & (hole_x > 1) & (hole_x < width - 2)
+                         & (hole_y > 1) & (hole_y < height - 2))
+                self.grid[hole_y[holes], hole_x[holes]] = 0
+                self.tagged[hole_y[holes], hole_x[holes]] = 1
+
+        if terrain:
+            self.generate_terrain()
+
+    def generate_terrain(self, zones=None, max_cost=TERRAIN_MAX_COST, rng=None):
+        """Rải các vùng chữ nhật đi chậm (chi phí 2..max_cost) lên mê cung
+
+        Mặc định một vùng cho mỗi TERRAIN_CELLS_PER_ZONE ô; chỗ các vùng chồng nhau lấy chi phí lớn hơn.
+        """
+        rng = rng or self.rng
+        if zones is None:
+            zones = max(1, self.width * self.height // TERRAIN_CELLS_PER_ZONE)
+        costs = np.copy(self.costs)
+        low, high = TERRAIN_ZONE_SIZES
+        for _ in range(zones):
+            w, h = rng.randint(low, high), rng.randint(low, high)
+            x, y = rng.randint(1, max(1, self.width - 2)), rng.randint(1, max(1, self.height - 2))
+            zone = costs[y:min(y + h, self.height - 1), x:min(x + w, self.width - 1)]
+            np.maximum(zone, rng.randint(2, max(2, max_cost)), out=zone)
+        self.set_costs(costs)
+
+    def set_costs(self, costs):
+        """Đặt lớp chi phí (mảng height x width, giá trị 1..255 là chi phí đi vào ô)"""
+        costs = np.clip(np.asarray(costs), 1, 255).astype(np.uint8)
+        self.costs = costs
+        self.step_costs = costs.T.tobytes()  # Theo chỉ số phẳng (theo cột)
+        self.min_step_cost = int(costs.min())
+        self.max_step_cost = int(costs.max())
+        self.version += 1
+        self._cluster_graph = None  # Khoảng cách trong cụm đổi hết
+
+    @property
+    def weighted(self):
+        """True nếu các bước có chi phí khác nhau (khi đó BFS không còn cho đường rẻ nhất)"""
+        return self.min_step_cost != self.max_step_cost
+
+    def step_cost(self, position):
+        """Chi phí đi vào ô position"""
+        x, y = position
+        return self.step_costs[x * self.height + y]
 
 
     def generate_loop_cluster(self, x, y, size):
@@ -105,14 +394,14 @@ class Maze:
             self.tag((x, j), outer=True)
             self.tag((x + width - 1, j), outer=True)
 
-        holes_count = random.randint(1, 4)
+        holes_count = self.rng.randint(1, 4)
         for _ in range(holes_count):
-            hole_x = random.randint(x, x + width - 1)
+            hole_x = self.rng.randint(x, x + width - 1)
             if (hole_x == x or hole_x == x + width - 1):
-                hole_y = random.randint(y + 1, y + height - 2)
+                hole_y = self.rng.randint(y + 1, y + height - 2)
                 self.tag((hole_x, hole_y), value=0)    
             else:
-                hole_y = random.choice([y, y + height - 1])
+                hole_y = self.rng.choice([y, y + height - 1])
                 self.tag((hole_x, hole_y), value=0)    
 
         for i in range(x + 1, x + width - 1):
@@ -145,14 +434,67 @@ class Maze:
         if (1 - offset < x < self.width - 2 + offset) and (1 - offset < y < self.height - 2 + offset):
             self.grid[y][x] = value
             self.tagged[y][x] = 1
+            self.version += 1
+            if self.neighbor_mask is not None:
+                self._patch_index(x, y)
+            if self._cluster_graph is not None:
+                self._cluster_graph.mark_dirty(x, y)  # Chỉ dựng lại cụm chứa ô này
+            if self._labels is not None:
+                self._patch_labels(x, y)
+
+    def _patch_labels(self, x, y):
+        """Cập nhật nhãn vùng liên thông sau khi ô (x, y) đổi giá trị"""
+        i = x * self.height + y
+        labels = self._labels
+        steps = self.mask_offsets[self.neighbor_mask[i]]
+        around = {int(labels[i + step]) for step in steps}
+        if self.grid[y][x] != 0:
+            labels[i] = -1
+            if len(steps) >= 2:
+                self._labels = None  # Có thể đã tách đôi vùng: tính lại khi cần
+        elif not around:
+            labels[i] = self._next_label  # Ô mở đứng riêng
+            self._next_label += 1
+        else:
+            keep = min(around)
+            labels[i] = keep
+            for other in around - {keep}:
+                labels[labels == other] = keep  # Ô này nối các vùng lại
 
-    def find_random_empty(self):
+    def find_random_empty(self, rng=None, reachable_from=None):
+        """Ô trống ngẫu nhiên; có reachable_from thì chỉ lấy ô cùng vùng liên thông với ô đó"""
+        rng = rng or self.rng
         while True:
-            x = random.randint(0, self.width - 1)
-            y = random.randint(0, self.height - 1)
-            if self.grid[y][x] == 0:
+            x = rng.randint(0, self.width - 1)
+            y = rng.randint(0, self.height - 1)
+            if self.grid[y][x] == 0 and (reachable_from is None or self.reachable((x, y), reachable_from)):
                 return (x, y)
 
+    def component_labels(self):
+        """Nhãn vùng liên thông của mọi ô (int32 theo chỉ số phẳng, -1 cho tường)"""
+        if self._labels is None:
+            self._labels = label_components(self.neighbor_mask, self.grid.T.ravel() == 0, self.height)
+            self._next_label = int(self._labels.max()) + 1
+        return self._labels
+
+    def reachable(self, a, b):
+        """True nếu hai ô (x, y) mở và cùng vùng liên thông, tra trong O(1)
+
+        Với MazeOverlay đây là câu trả lời của mê cung gốc: các ô bị chặn tạm thời
+        không được tính, nên False luôn đúng còn True có thể vẫn không có đường.
+        """
+        labels = self.component_labels()
+        label = labels[a[0] * self.height + a[1]]
+        return bool(label >= 0 and label == labels[b[0] * self.height + b[1]])
+
+    def largest_component(self, position=None):
+        """Một ô thuộc vùng liên thông lớn nhất (ưu tiên position nếu nó thuộc vùng đó)"""
+        labels = self.component_labels()
+        largest = np.argmax(np.bincount(labels[labels >= 0]))
+        if position is not None and labels[self.index(position)] == largest:
+            return position
+        return self.position(int(np.flatnonzero(labels == largest)[0]))
+
     def is_wall(self, position):
         x, y = position
         if 0 <= x < self.width and 0 <= y < self.height:
@@ -162,18 +504,234 @@ class Maze:
     def get_neighbors(self, position):
         """Trả về các ô lân cận có thể di chuyển đến (lên, xuống, trái, phải)"""
         x, y = position
-        neighbors = []
         # Thứ tự: phải, xuống, trái, lên (để DFS ưu tiên hướng ngược lại)
-        for dx, dy in [(1, 0), (0, 1), (-1, 0), (0, -1)]:
-            nx, ny = x + dx, y + dy
+        return [(x + dx, y + dy) for dx, dy in MASK_STEPS[self.neighbor_mask[x * self.height + y]]]
+
+    def cache_key(self):
+        """Khóa nhận diện đúng trạng thái hiện tại của lưới (đổi khi tag())"""
+        return (self.uid, self.version)
+
+    def index(self, position):
+        """Chuyển (x, y) thành chỉ số ô phẳng (đánh số theo cột: x * height + y)"""
+        x, y = position
+        return x * self.height + y
+
+    def position(self, index):
+        """Chuyển chỉ số ô phẳng về lại (x, y)"""
+        return divmod(index, self.height)
+
+    def build_index(self):
+        """Xây lại toàn bộ chỉ mục lân cận: mỗi ô một mặt nạ 4 bit các hướng đi được"""
+        # Đánh số theo cột để thứ tự số nguyên trùng với thứ tự tuple (x, y)
+        open_cells = self.grid.T == 0
+        masks = np.zeros(open_cells.shape, dtype=np.uint8)
+        masks[:-1, :] |= open_cells[1:, :] * np.uint8(1)
+        masks[:, :-1] |= open_cells[:, 1:] * np.uint8(2)
+        masks[1:, :] |= open_cells[:-1, :] * np.uint8(4)
+        masks[:, 1:] |= open_cells[:, :-1] * np.uint8(8)
+        self.neighbor_mask = bytearray(masks.tobytes())
+
+    def bfs_distances(self, source):
+        """Khoảng cách BFS từ ô source (chỉ số phẳng) tới mọi ô, -1 nếu không tới được"""
+        return self.distance_transform([source])
+
+    def distance_transform(self, sources):
+        """Khoảng cách BFS (mảng int32 theo chỉ số phẳng) từ ô gần nhất trong sources, -1 nếu không tới được
+
+        sources là một ô (x, y) hoặc danh sách ô (x, y) / chỉ số phẳng. Mỗi vòng lặp
+        mở rộng cả một lớp sóng bằng phép toán mảng NumPy: mỗi ô biên dịch sang các
+        ô kề theo những hướng có bit trong mặt nạ lân cận. Dạng lưới (height x width):
+        dist.reshape(width, height).T
+        """
+        if isinstance(sources, tuple):
+            sources = [sources]
+        cells = [self.index(cell) if isinstance(cell, tuple) else int(cell) for cell in sources]
+        mask = np.frombuffer(self.neighbor_mask, dtype=np.uint8)
+        dist = np.full(mask.size, -1, dtype=np.int32)
+        stamp = np.empty(mask.size, dtype=np.intp)  # Để bỏ ô trùng trong một lớp sóng mà không cần sắp xếp
+        frontier = np.unique(np.array(cells, dtype=np.intp))
+        dist[frontier] = 0
+        # Độ lệch chỉ số phẳng theo thứ tự DIRECTIONS (phải, xuống, trái, lên)
+        offsets = np.array([dx * self.height + dy for dx, dy in DIRECTIONS], dtype=np.intp)
+        level = 0
+        while frontier.size:
+            level += 1
+            wave = (frontier[:, None] + offsets)[MASK_BITS[mask[frontier]]]
+            wave = wave[dist[wave] == -1]
+            order = np.arange(wave.size)
+            stamp[wave] = order
+            wave = wave[stamp[wave] == order]
+            dist[wave] = level
+            frontier = wave
+        return dist
+
+    def precompute_landmarks(self, count=8):
+        """Chọn `count` landmark (điểm xa nhất lần lượt) và lưu khoảng cách BFS từ chúng cho heuristic ALT"""
+        open_cells = np.flatnonzero(self.grid.T.ravel() == 0)
+        if open_cells.size == 0:
+            return
+        # Bắt đầu từ một ô của vùng liên thông lớn nhất (không dùng self.rng: các lần rút ngẫu nhiên sau giữ nguyên)
+        first = self.bfs_distances(self.index(self.largest_component()))
+
+        landmarks, distances = [], []
+        nearest = np.where(first >= 0, first, 0)
+        for _ in range(count):
+            landmark = int(np.argmax(nearest))
+            if landmark in landmarks:
+                break
+            dist = self.bfs_distances(landmark)
+            landmarks.append(landmark)
+            distances.append(dist)
+            nearest = np.minimum(nearest, np.where(dist >= 0, dist, 0))
+        self.landmarks = landmarks
+        self.landmark_distances = np.array(distances, dtype=np.int32)
+        self._landmark_lists = [dist.tolist() for dist in distances]
+        self._bound_version = self.version
+
+    def precompute_distance_table(self, max_cells=4096):
+        """Bảng khoảng cách mọi cặp ô (cho lưới nhỏ); trả về False nếu lưới lớn hơn max_cells"""
+        cells = self.width * self.height
+        if cells > max_cells:
+            return False
+        table = np.full((cells, cells), -1, dtype=np.int16)
+        for cell in np.flatnonzero(self.grid.T.ravel() == 0).tolist():
+            table[cell] = self.bfs_distances(cell)
+        self.distance_table = table
+        self._bound_version = self.version
+        return True
+
+    def precompute_heuristic(self, mode, landmarks=8):
+        """mode: None (chỉ Manhattan), "landmarks" hoặc "table" (lưới quá lớn thì dùng landmarks)"""
+        if mode == "table" and self.precompute_distance_table():
+            return
+        if mode in ("table", "landmarks"):
+            self.precompute_landmarks(landmarks)
+
+    def distance_bound(self, goal):
+        """Hàm chặn dưới khoảng cách từ một ô (chỉ số phẳng) tới goal, hoặc None nếu chưa tiền xử lý
+
+        Hàm trả về -1 khi biết chắc ô đó không tới được goal.
+        """
+        if self._bound_version is None:
+            return None
+        if self._bound_version != self.version:
+            # Lưới đã đổi sau khi tiền xử lý: bỏ dữ liệu cũ
+            self.landmarks, self.landmark_distances, self.distance_table = [], None, None
+            self._bound_version = None
+            return None
+
+        if self.distance_table is not None:
+            return self.distance_table[goal].tolist().__getitem__
+
+        height = self.height
+        goal_x, goal_y = divmod(goal, height)
+        pairs = [(dist[goal], dist) for dist in self._landmark_lists]
+
+        def bound(cell):
+            x, y = divmod(cell, height)
+            best = abs(x - goal_x) + abs(y - goal_y)
+            for to_goal, dist in pairs:
+                to_cell = dist[cell]
+                if (to_goal < 0) != (to_cell < 0):
+                    return -1  # Khác vùng liên thông với landmark
+                if to_goal - to_cell > best:
+                    best = to_goal - to_cell
+                elif to_cell - to_goal > best:
+                    best = to_cell - to_goal
+            return best
+        return bound
+
+    def jump_tables(self):
+        """Bảng (run, jump) của JPS+ cho lưới hiện tại; tính lại khi tag() đã đổi lưới"""
+        if self._jump_tables is None or self._jump_tables[0] != self.version:
+            tables = build_jump_tables(self.neighbor_mask, self.width, self.height)
+            self._jump_tables = (self.version, tables)
+        return self._jump_tables[1]
+
+    def cluster_graph(self, cluster_size=HPA_CLUSTER_SIZE):
+        """Đồ thị cụm của HPA*; tạo lần đầu khi cần, sau đó tag() chỉ đánh dấu cụm phải dựng lại"""
+        if self._cluster_graph is None or self._cluster_graph.cluster_size != cluster_size:
+            self._cluster_graph = ClusterGraph(self, cluster_size)
+        return self._cluster_graph
+
+    def _patch_index(self, x, y):
+        """Cập nhật mặt nạ của 4 ô kề với (x, y) sau khi ô này đổi giá trị"""
+        is_open = self.grid[y][x] == 0
+        for d, (dx, dy) in enumerate(DIRECTIONS):
+            # Ô (nx, ny) nhìn thấy (x, y) theo hướng d
+            nx, ny = x - dx, y - dy
             if 0 <= nx < self.width and 0 <= ny < self.height:
-                if not self.is_wall((nx, ny)):
-                    neighbors.append((nx, ny))
-        return neighbors
-    
+                i = nx * self.height + ny
+                if is_open:
+                    self.neighbor_mask[i] |= 1 << d
+                else:
+                    self.neighbor_mask[i] &= ~(1 << d) & 0xF
+
     def copy(self):
-        """Tạo một bản sao của mê cung"""
-        maze = Maze(self.width, self.height)
+        """Tạo một bản sao của mê cung (chỉ sao chép mảng, không sinh lại)"""
+        maze = Maze.__new__(Maze)
+        maze._setup(self.width, self.height, self.seed)
+        maze.rng = self.rng
         maze.grid = np.copy(self.grid)
+        maze.tagged = np.copy(self.tagged)
+        maze.costs = np.copy(self.costs)
+        maze.step_costs = self.step_costs
+        maze.min_step_cost, maze.max_step_cost = self.min_step_cost, self.max_step_cost
+        maze.neighbor_mask = bytearray(self.neighbor_mask)
         return maze
+
+
+class MazeOverlay:
+    """Mê cung gốc cộng thêm một tập nhỏ ô bị chặn tạm thời (ví dụ vị trí các ghost khác)
+
+    Không sao chép lưới: is_wall/get_neighbors lọc các ô bị chặn, còn neighbor_mask
+    cho engine mảng chỉ được tạo (sao chép mặt nạ rồi vá) khi có ai đọc tới.
+    Mọi thuộc tính khác lấy từ mê cung gốc; riêng grid là lưới gốc, chưa có ô bị chặn.
+    """
+
+    def __init__(self, base, blocked=()):
+        self.base = base
+        self.blocked = {
+            (x, y) for x, y in blocked if 0 <= x < base.width and 0 <= y < base.height
+        }
+        self._neighbor_mask = None
+        self._jump_tables = None
+
+    def __getattr__(self, name):
+        return getattr(self.base, name)
+
+    def cache_key(self):
+        """Lớp phủ tạm thời thì không được cache"""
+        return None
+
+    def is_wall(self, position):
+        return position in self.blocked or self.base.is_wall(position)
+
+    def get_neighbors(self, position):
+        blocked = self.blocked
+        return [neighbor for neighbor in self.base.get_neighbors(position) if neighbor not in blocked]
+
+    @property
+    def neighbor_mask(self):
+        if self._neighbor_mask is None:
+            mask = bytearray(self.base.neighbor_mask)
+            height = self.base.height
+            for x, y in self.blocked:
+                # Xóa bit hướng về ô bị chặn ở 4 ô kề
+                for d, (dx, dy) in enumerate(DIRECTIONS):
+                    nx, ny = x - dx, y - dy
+                    if 0 <= nx < self.base.width and 0 <= ny < height:
+                        mask[nx * height + ny] &= ~(1 << d) & 0xF
+            self._neighbor_mask = mask
+        return self._neighbor_mask
     
+
+    def jump_tables(self):
+        """Bảng JPS+ riêng của lớp phủ (ô bị chặn làm đổi các jump point)"""
+        if self._jump_tables is None:
+            self._jump_tables = build_jump_tables(self.neighbor_mask, self.base.width, self.base.height)
+        return self._jump_tables
+
+    # Dùng neighbor_mask của lớp phủ nên các ô bị chặn cũng chặn sóng
+    distance_transform = Maze.distance_transform
+    # cluster_graph() là của mê cung gốc: hpa_star tự đi vòng qua các ô bị chặn
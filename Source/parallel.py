@@ -0,0 +1,68 @@
+# Source\parallel.py
+"""Process-pool planning stage: run many ghosts' searches of one tick in parallel.
+
+The maze grid and cost layer are copied once into shared memory; every worker attaches to it
+when it starts and builds its own Maze (and neighbor index) over that buffer,
+so a job only carries (algorithm, backend, start, goal, blocked).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from maze import Maze, MazeOverlay
+from grid_search import BACKENDS
+from instrumentation import profiler, OFF
+
+# Per-worker state, set by _init_worker
+_worker_maze = None
+_worker_memory = None
+
+
+def _init_worker(memory_name, shape, profiler_mode):
+    global _worker_maze, _worker_memory
+    _worker_memory = shared_memory.SharedMemory(name=memory_name)
+    grid = np.ndarray(shape, dtype=np.uint8, buffer=_worker_memory.buf)
+    costs = np.ndarray(shape, dtype=np.uint8, buffer=_worker_memory.buf, offset=grid.nbytes)
+    _worker_maze = Maze.from_grid(grid, costs=costs)
+    profiler.set_mode(profiler_mode)
+
+
+def _run_job(job):
+    algorithm, backend, start, goal, blocked = job
+    maze = MazeOverlay(_worker_maze, blocked) if blocked else _worker_maze
+    result = BACKENDS[backend][algorithm](maze, start, goal)
+    record = profiler.last() if profiler.mode != OFF else None
+    return result, record
+
+
+class ParallelPlanner:
+    def __init__(self, maze, workers):
+        self.maze = maze
+        self.workers = workers
+        grid = np.asarray(maze.grid, dtype=np.uint8)
+        self.memory = shared_memory.SharedMemory(create=True, size=max(2 * grid.nbytes, 1))
+        np.ndarray(grid.shape, dtype=np.uint8, buffer=self.memory.buf)[:] = grid
+        np.ndarray(grid.shape, dtype=np.uint8, buffer=self.memory.buf, offset=grid.nbytes)[:] = maze.costs
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(self.memory.name, grid.shape, profiler.mode),
+        )
+
+    def search(self, jobs):
+        """Run (algorithm, backend, start, goal, blocked) jobs; results come back in job order
+
+        Each result is ((path, expanded_nodes, search_time, memory_usage), SearchRecord or None).
+        """
+        if not jobs:
+            return []
+        chunksize = max(1, len(jobs) // (self.workers * 4))
+        results = list(self.executor.map(_run_job, jobs, chunksize=chunksize))
+        for _, record in results:
+            if record is not None:
+                profiler.records.append(record)
+        return results
+
+    def close(self):
+        self.executor.shutdown()
+        self.memory.close()
+        self.memory.unlink()
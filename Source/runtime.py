@@ -1,6 +1,12 @@
+from collections import deque
+from time import perf_counter
+import numpy as np
 import pygame
 from maze import Maze
-from ghost import Ghost
+from ghost import Ghost, UNWEIGHTED_ALGORITHMS
+from grid_search import DistanceField
+from parallel import ParallelPlanner
+from instrumentation import append_metrics
 from constants import *
 
 class PygameRuntime:
@@ -12,20 +18,48 @@ class PygameRuntime:
         self.font = pygame.font.SysFont('Arial', 16)
         self.running = True
         self.game_started = False
-        self.maze = Maze(GRID_SIZE, GRID_SIZE)
-        self.pacman_pos = (1, 1)
+        self.maze = Maze.load(MAZE_FILE) if MAZE_FILE else Maze(GRID_SIZE, GRID_SIZE, seed=MAZE_SEED, terrain=MAZE_TERRAIN)
+        self.maze.precompute_heuristic(HEURISTIC_PRECOMPUTE, LANDMARK_COUNT)
+        self.distance_field = DistanceField(self.maze)
+        # The field holds step counts, so on weighted terrain it only serves cost-blind algorithms
+        self.shared_field_algorithms = tuple(
+            a for a in SHARED_FIELD_ALGORITHMS if not self.maze.weighted or a in UNWEIGHTED_ALGORITHMS)
+        self.parallel_planner = None  # Created on first use when PARALLEL_WORKERS > 0
+        self.pacman_pos = self.maze.largest_component((1, 1))  # Not in a sealed pocket
         self.ghosts = []
         self.selected_algorithms = []
         self.click_mode = "MOVE_PACMAN"
         self.screen_color = BLACK
         self.wall_color = GRAY
         self.path_color = BLACK
+        self.terrain_color = BROWN
         self.pacman_color = YELLOW
+        # Dirty-rectangle rendering: the static maze is drawn once into maze_surface;
+        # each frame only the regions sprites covered last frame and this frame are repainted
+        self.maze_surface = None
+        self.maze_surface_key = None
+        self.dirty_rects = []  # Drawn last frame, restored from maze_surface this frame
+        self.frame_rects = []  # Drawn this frame
+        self.full_redraw = True
+        # Fixed-timestep simulation (see SIMULATION_TICK_RATE)
+        self.tick_time = 1 / SIMULATION_TICK_RATE
+        self.accumulator = 0.0
+        self.max_speed = False
+        self.ticks = 0
+        self.stats_overlays = deque()  # Final stats popups waiting to be closed, oldest shown first
+        # Search heatmap (H): the ghost whose latest traced search is shown, None when off
+        self.heatmap_ghost = None
+        self.heatmap_surface = None
+        self.heatmap_trace = None  # Trace the cached surface was built from
         self.buttons = [
             {"label": "Add BFS Ghost (b)", "action": "BFS"},
             {"label": "Add DFS Ghost (d)", "action": "DFS"},
             {"label": "Add UCS Ghost (u)", "action": "UCS"},
             {"label": "Add A* Ghost (a)", "action": "Astar"},
+            {"label": "Add JPS Ghost (j)", "action": "JPS"},
+            {"label": "Add BiBFS Ghost (i)", "action": "BiBFS"},
+            {"label": "Add BiA* Ghost (o)", "action": "BiAstar"},
+            {"label": "Add HPA* Ghost (c)", "action": "HPA"},
             {"label": "Start Game (SPACE)", "action": "START"},
             {"label": "EXIT Game (ESC)", "action": "EXIT"},
         ]
@@ -50,11 +84,14 @@ class PygameRuntime:
         for ghost in self.ghosts:
             ghost.start()
         self.game_started = True
+        self.accumulator = 0.0
+        self.full_redraw = True  # Clear the button panel
 
     def pause_game(self):
         for ghost in self.ghosts:
             ghost.stop()
         self.game_started = False
+        self.full_redraw = True
 
     def change_click_mode(self, mode):
         if self.click_mode == mode:
@@ -72,7 +109,14 @@ class PygameRuntime:
                         case pygame.K_ESCAPE:
                             self.running = False
                         case pygame.K_SPACE:    
-                            self.pause_game()
+                            if self.stats_overlays:
+                                self.stats_overlays.popleft()
+                            else:
+                                self.pause_game()
+                        case pygame.K_f:
+                            self.toggle_max_speed()
+                        case pygame.K_h:
+                            self.cycle_heatmap()
                         case pygame.K_UP:
                             self.move_pacman("UP")
                         case pygame.K_DOWN:
@@ -111,8 +155,19 @@ class PygameRuntime:
                             self.change_click_mode("UCS")
                         case pygame.K_a:
                             self.change_click_mode("Astar")
+                        case pygame.K_j:
+                            self.change_click_mode("JPS")
+                        case pygame.K_i:
+                            self.change_click_mode("BiBFS")
+                        case pygame.K_o:
+                            self.change_click_mode("BiAstar")
+                        case pygame.K_c:
+                            self.change_click_mode("HPA")
                         case pygame.K_SPACE:
-                            self.start_game()
+                            if self.stats_overlays:
+                                self.stats_overlays.popleft()
+                            else:
+                                self.start_game()
                     # print(self.click_mode)
                 case pygame.MOUSEBUTTONDOWN:
                     mouse_pos = pygame.mouse.get_pos()
@@ -134,26 +189,44 @@ class PygameRuntime:
                             rect = pygame.Rect(x, y, CELL_SIZE, CELL_SIZE)
                             if rect.collidepoint(mouse_pos):
                                 if not self.maze.is_wall((j, k)):
+                                    # Only cells the ghosts can reach Pac-Man from (and back)
                                     if self.click_mode == "MOVE_PACMAN":
-                                        if self.pacman_pos not in [ghost.position for ghost in self.ghosts]:
+                                        if (self.pacman_pos not in [ghost.position for ghost in self.ghosts]
+                                                and all(self.maze.reachable((j, k), ghost.position) for ghost in self.ghosts)):
                                             self.pacman_pos = (j, k)
                                     else:
-                                        if (j,k) not in [ghost.position for ghost in self.ghosts] and self.pacman_pos != (j, k):
+                                        if ((j,k) not in [ghost.position for ghost in self.ghosts] and self.pacman_pos != (j, k)
+                                                and self.maze.reachable((j, k), self.pacman_pos)):
                                             self.add_ghost(self.click_mode, (j, k))
                                             
 
-    def draw_maze(self):
-        # Draw background and maze
-        self.screen.fill(self.screen_color)
-        # Draw maze
+    def build_maze_surface(self):
+        """Render the static maze (walls, floor, slow zones) once into an off-screen surface"""
+        surface = pygame.Surface((GRID_SIZE * CELL_SIZE, GRID_SIZE * CELL_SIZE))
+        surface.fill(self.screen_color)
         for y in range(GRID_SIZE):
             for x in range(GRID_SIZE):
                 rect = pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
                 if self.maze.is_wall((x, y)):
-                    pygame.draw.rect(self.screen, self.wall_color, rect)
+                    pygame.draw.rect(surface, self.wall_color, rect)
                 else:
-                    pygame.draw.rect(self.screen, self.path_color, rect)
-                    pygame.draw.rect(self.screen, (50, 50, 50), rect, 1)
+                    slow = self.maze.step_cost((x, y)) > 1
+                    pygame.draw.rect(surface, self.terrain_color if slow else self.path_color, rect)
+                    pygame.draw.rect(surface, (50, 50, 50), rect, 1)
+        self.maze_surface = surface
+        self.maze_surface_key = self.maze.cache_key()
+
+    def draw_maze(self):
+        """Repaint the maze under last frame's sprites, or the whole window after a full redraw"""
+        if self.maze_surface is None or self.maze_surface_key != self.maze.cache_key():
+            self.build_maze_surface()
+            self.full_redraw = True
+        if self.full_redraw:
+            self.screen.fill(self.screen_color)
+            self.screen.blit(self.maze_surface, (0, 0))
+        else:
+            for rect in self.dirty_rects:
+                self.screen.blit(self.maze_surface, rect, rect)
 
     def draw_pacman(self):
         if self.pacman_pos is None:
@@ -161,37 +234,189 @@ class PygameRuntime:
 
         x, y = self.pacman_pos
         rect = pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-        pygame.draw.circle(self.screen, self.pacman_color, rect.center, CELL_SIZE // 2 - 2)
+        self.frame_rects.append(pygame.draw.circle(self.screen, self.pacman_color, rect.center, CELL_SIZE // 2 - 2))
 
     def draw_ghosts(self):
         for ghost in self.ghosts:
             x, y = ghost.position
             rect = pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-            pygame.draw.circle(self.screen, ghost.color, rect.center, CELL_SIZE // 2 - 2)
+            self.frame_rects.append(pygame.draw.circle(self.screen, ghost.color, rect.center, CELL_SIZE // 2 - 2))
 
             if ghost.path:
-                path = [(x, y)] + ghost.path
+                path = [(x, y), *ghost.path]
                 for i in range(len(path) - 1):
                     start_pos = (path[i][0] * CELL_SIZE + CELL_SIZE // 2, path[i][1] * CELL_SIZE + CELL_SIZE // 2)
                     end_pos = (path[i + 1][0] * CELL_SIZE + CELL_SIZE // 2, path[i + 1][1] * CELL_SIZE + CELL_SIZE // 2)
-                    pygame.draw.line(self.screen, ghost.color, start_pos, end_pos, 2)
+                    self.frame_rects.append(pygame.draw.line(self.screen, ghost.color, start_pos, end_pos, 2))
+
+    def present(self):
+        """Push only the changed regions to the display (everything after a full redraw)"""
+        if self.full_redraw:
+            pygame.display.flip()
+            self.full_redraw = False
+        else:
+            pygame.display.update(self.dirty_rects + self.frame_rects)
+        self.dirty_rects, self.frame_rects = self.frame_rects, []
 
     def game_runtime(self):
         if self.ghosts == []:
             self.game_started = False
             return
 
+        # One reverse search from Pac-Man serves every ghost using the shared field
+        field_ghosts = [g for g in self.ghosts if g.algorithm in self.shared_field_algorithms]
+        if field_ghosts:
+            self.distance_field.update(self.pacman_pos, [g.position for g in field_ghosts])
+
+        if PARALLEL_WORKERS > 0:
+            self.plan_in_parallel()
+
         for ghost in self.ghosts:
             if ghost.position == self.pacman_pos:
                 self.ghosts.remove(ghost)
-            ghost.move(self.maze, self.pacman_pos, self.screen, self.font, [g.position for g in self.ghosts if g != ghost])
-            
+            field = self.distance_field if ghost.algorithm in self.shared_field_algorithms else None
+            reached = ghost.reached_target
+            ghost.move(self.maze, self.pacman_pos, [g.position for g in self.ghosts if g != ghost], field)
+            if ghost.reached_target and not reached:
+                self.report_final_stats(ghost)
+        self.ticks += 1
+
+    def report_final_stats(self, ghost):
+        """Queue the stats overlay for a ghost that reached Pac-Man and write its metrics"""
+        if METRICS_FILE:
+            metrics = ghost.final_metrics()
+            metrics["tick"] = self.ticks
+            append_metrics(METRICS_FILE, metrics)
+        stats = ghost.final_stats()
+        if stats:
+            self.stats_overlays.append(stats)
+
+
+    def plan_in_parallel(self):
+        """Search for every ghost that will replan this tick on the process pool, then apply in ghost order"""
+        ghosts = [
+            g for g in self.ghosts
+            if g.needs_replan(self.pacman_pos)
+            and g.can_plan_in_parallel(self.distance_field if g.algorithm in self.shared_field_algorithms else None)
+        ]
+        if not ghosts:
+            return
+        if self.parallel_planner is None:
+            self.parallel_planner = ParallelPlanner(self.maze, PARALLEL_WORKERS)
+
+        jobs = [(g.algorithm, g.backend, g.position, self.pacman_pos, ()) for g in ghosts]
+        for ghost, (result, record) in zip(ghosts, self.parallel_planner.search(jobs)):
+            reached = ghost.reached_target
+            ghost.apply_search(result, self.pacman_pos, record)
+            ghost.plan_ready = True
+            if ghost.reached_target and not reached:
+                self.report_final_stats(ghost)
+
+    def cycle_heatmap(self):
+        """Show the next ghost's search heatmap (off -> ghost 1 -> ghost 2 -> ... -> off)
+
+        Only the shown ghost traces its searches, so the others keep the untraced code path.
+        """
+        if self.heatmap_ghost is not None:
+            self.heatmap_ghost.tracing = TRACE_SEARCHES
+        ghosts = self.ghosts
+        index = ghosts.index(self.heatmap_ghost) + 1 if self.heatmap_ghost in ghosts else 0
+        self.heatmap_ghost = ghosts[index] if index < len(ghosts) else None
+        if self.heatmap_ghost is not None:
+            self.heatmap_ghost.tracing = True
+        self.full_redraw = True
+
+    def toggle_max_speed(self):
+        self.max_speed = not self.max_speed
+        self.accumulator = 0.0
+        self.full_redraw = True
 
-        self.handle_game_input()
+    def simulate(self, elapsed):
+        """Advance the simulation by `elapsed` seconds of wall time in fixed ticks
+
+        At max speed ticks run back to back until the next frame is due instead.
+        """
+        if PAUSE_ON_STATS and self.stats_overlays:
+            self.accumulator = 0.0
+            return
+        if self.max_speed:
+            frame_time = 1 / MAX_SPEED_RENDER_FPS if MAX_SPEED_RENDER_FPS else 0.1
+            deadline = perf_counter() + frame_time
+            while self.game_started and perf_counter() < deadline:
+                self.game_runtime()
+                if PAUSE_ON_STATS and self.stats_overlays:
+                    break
+            return
 
+        self.accumulator += elapsed
+        ticks = 0
+        while self.game_started and self.accumulator >= self.tick_time:
+            if ticks == MAX_TICKS_PER_FRAME or (PAUSE_ON_STATS and self.stats_overlays):
+                self.accumulator = 0.0
+                break
+            self.game_runtime()
+            self.accumulator -= self.tick_time
+            ticks += 1
+
+    def render(self):
+        self.draw_maze()
+        self.draw_heatmap()
+        if not self.game_started:
+            self.draw_ui()
+        self.draw_pacman()
+        self.draw_ghosts()
+        if self.stats_overlays:
+            self.draw_stats_overlay(self.stats_overlays[0])
+        self.present()
+
+    def build_heatmap_surface(self, trace):
+        """Color the cells of a SearchTrace: early expansions blue, late ones red, frontier yellow"""
+        rank = trace.heatmap()[:GRID_SIZE, :GRID_SIZE]
+        expanded = rank >= 0
+        colors = np.zeros(rank.shape + (3,), dtype=np.uint8)
+        colors[expanded, 0] = (rank[expanded] * 255).astype(np.uint8)
+        colors[expanded, 2] = 255 - colors[expanded, 0]
+        colors[rank == -1] = YELLOW
+        surface = pygame.surfarray.make_surface(colors)
+        surface = pygame.transform.scale(surface, (GRID_SIZE * CELL_SIZE, GRID_SIZE * CELL_SIZE))
+        surface.set_colorkey(BLACK)  # Cells the search never reached stay transparent
+        surface.set_alpha(140)
+        return surface
+
+    def draw_heatmap(self):
+        ghost = self.heatmap_ghost
+        if ghost is None or ghost.last_trace is None:
+            return
+        if ghost.last_trace is not self.heatmap_trace:
+            self.heatmap_trace = ghost.last_trace
+            self.heatmap_surface = self.build_heatmap_surface(ghost.last_trace)
+        self.screen.blit(self.heatmap_surface, (0, 0))
+        self.frame_rects.append(self.heatmap_surface.get_rect())
+
+    def draw_stats_overlay(self, stats):
+        """Draw a ghost's final statistics popup over the maze"""
+        popup_width = 450
+        line_height = 30
+        popup_height = len(stats) * line_height + 20
+        popup_rect = pygame.Rect(
+            (WIDTH - popup_width) // 2,
+            (HEIGHT - popup_height) // 2,
+            popup_width,
+            popup_height
+        )
+        pygame.draw.rect(self.screen, (50, 50, 50), popup_rect)
+        pygame.draw.rect(self.screen, WHITE, popup_rect, 2)
+        for i, stat in enumerate(stats):
+            text_surface = self.font.render(stat, True, WHITE)
+            self.screen.blit(text_surface, (
+                popup_rect.x + 20,
+                popup_rect.y + 10 + i * line_height
+            ))
+        self.frame_rects.append(popup_rect)
 
     def draw_ui(self):
         x = GRID_SIZE * CELL_SIZE + 20
+        self.frame_rects.append(pygame.Rect(GRID_SIZE * CELL_SIZE, 0, 200, GRID_SIZE * CELL_SIZE))
         for i, button in enumerate(self.buttons):
             y = 20 + i * (40 + 10)
             rect = pygame.Rect(x, y, 150, 40)
@@ -209,21 +434,25 @@ class PygameRuntime:
 
     
     def run(self):
+        last = perf_counter()
         while self.running:
-            self.draw_maze()
+            now = perf_counter()
+            elapsed, last = now - last, now
 
             if not self.game_started:
                 self.handle_settings_input()
-                self.draw_ui()
             else:
-                self.game_runtime()
+                self.handle_game_input()
+                self.simulate(elapsed)
 
-            self.draw_pacman()
-            self.draw_ghosts()
-
-            pygame.display.flip()
-            self.clock.tick(10)
+            fast_forward = self.max_speed and self.game_started
+            if not (fast_forward and not MAX_SPEED_RENDER_FPS):
+                self.render()
+            if not fast_forward:
+                self.clock.tick(RENDER_FPS)
 
+        if self.parallel_planner is not None:
+            self.parallel_planner.close()
         pygame.quit()
                         
 
@@ -1,33 +1,116 @@
 # Source\search_algorithms.py
-from collections import deque
+from collections import deque, OrderedDict
+import functools
 import heapq
-import time
-import sys
-import tracemalloc
+from operator import itemgetter
+from time import perf_counter_ns
+from constants import PATH_CACHE_SIZE, BUCKET_QUEUE_MAX_COST
+from instrumentation import profiler, SearchRecord, OFF
 
 def measure_performance(func):
-    """Decorator to measure time, memory and expanded nodes"""
-    def wrapper(maze, start, goal):
-        tracemalloc.start()
-        start_time = time.time()
-        
-        path, expanded_nodes = func(maze, start, goal)
-        
-        search_time = time.time() - start_time
-        current, peak = tracemalloc.get_traced_memory()
-        tracemalloc.stop()
-        
-        return path, expanded_nodes, search_time, peak / 1024  # Convert to KB
+    """Decorator to measure time, memory and expanded nodes
+
+    The wrapped search returns (path, expanded_nodes, frontier_peak, visited_count);
+    callers get (path, expanded_nodes, search_time, memory_kb) and the full
+    record goes to the profiler's ring buffer. Start/goal pairs in different
+    connected components (Maze.reachable) return an empty path without searching.
+    """
+    @functools.wraps(func)
+    def search(maze, start, goal, *args, **kwargs):
+        if not maze.reachable(start, goal):
+            return [], 0, 0, 0  # Khác vùng liên thông: khỏi phải loang hết cả vùng
+        return func(maze, start, goal, *args, **kwargs)
+
+    @functools.wraps(func)
+    def wrapper(maze, start, goal, *args, **kwargs):
+        return profiler.measure(search, maze, start, goal, *args, **kwargs)
     return wrapper
 
+class HeapQueue:
+    """Hàng đợi ưu tiên trên heapq; cùng priority thì so tie rồi tới item"""
+
+    def __init__(self):
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, priority, item, tie=0):
+        heapq.heappush(self.heap, (priority, tie, item))
+
+    def pop(self):
+        priority, _, item = heapq.heappop(self.heap)
+        return priority, item
+
+
+class BucketQueue:
+    """Hàng đợi bucket (Dial) cho priority nguyên gần như không giảm
+
+    Các priority còn trong hàng đợi phải nằm trong [cursor, cursor + span), nên
+    chỉ cần `span` bucket dùng vòng tròn. Cùng priority thì lấy tie nhỏ trước
+    như HeapQueue (cùng tie thì LIFO): bucket được sắp theo tie một lần khi
+    cursor tới nó. Với A* (tie = h nhất quán) node đẩy vào bucket hiện tại luôn
+    có h nhỏ hơn node vừa lấy ra, nên thứ tự đó giữ được mà không phải sắp lại.
+    """
+
+    def __init__(self, span):
+        self.buckets = [[] for _ in range(span)]
+        self.span = span
+        self.cursor = 0
+        self.ordered = None  # Priority của bucket đang được sắp theo tie
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, priority, item, tie=0):
+        if priority < self.cursor:
+            self.cursor = priority
+        bucket = self.buckets[priority % self.span]
+        if priority == self.ordered and bucket and tie > bucket[-1][0]:
+            self.ordered = None  # Phá thứ tự: sắp lại ở lần pop sau
+        bucket.append((tie, item))
+        self.size += 1
+
+    def pop(self):
+        buckets, span = self.buckets, self.span
+        while not buckets[self.cursor % span]:
+            self.cursor += 1
+        bucket = buckets[self.cursor % span]
+        if self.ordered != self.cursor:
+            bucket.sort(key=itemgetter(0), reverse=True)  # tie nhỏ nhất ở cuối; sort ổn định nên vẫn LIFO
+            self.ordered = self.cursor
+        self.size -= 1
+        return self.cursor, bucket.pop()[1]
+
+
+def bucket_span(maze):
+    """Số bucket cần cho UCS/A* trên maze, hoặc 0 nếu chi phí bước không phải số nguyên nhỏ
+
+    f của A* tăng tối đa 2 lần chi phí bước mỗi lần mở rộng (g tăng c, h đổi tối đa c).
+    """
+    cost = maze.max_step_cost
+    if isinstance(cost, int) and 0 < cost <= BUCKET_QUEUE_MAX_COST:
+        return 2 * cost + 1
+    return 0
+
+
+def make_frontier(maze):
+    """BucketQueue khi chi phí bước là số nguyên nhỏ, không thì HeapQueue"""
+    span = bucket_span(maze)
+    return BucketQueue(span) if span else HeapQueue()
+
+
 @measure_performance
 def bfs(maze, start, goal):
     queue = deque([start])  # Hàng đợi FIFO
     visited = {start: None}  # Lưu trữ node cha
     expanded_nodes = 0  # Đếm số node đã mở rộng
+    frontier_peak = 1
 
     while queue:
         current = queue.popleft()  # Lấy node đầu tiên (FIFO)
+        # trace: expand(current)
         expanded_nodes += 1
 
         if current == goal:
@@ -35,8 +118,11 @@ def bfs(maze, start, goal):
 
         for neighbor in maze.get_neighbors(current):
             if neighbor not in visited:
+                # trace: discover(neighbor)
                 visited[neighbor] = current  # Ghi nhận node cha
                 queue.append(neighbor)  # Thêm vào cuối hàng đợi
+        if len(queue) > frontier_peak:
+            frontier_peak = len(queue)
 
     # Truy vết đường đi
     path = []
@@ -47,16 +133,18 @@ def bfs(maze, start, goal):
             current = visited[current]
         path.reverse()  # Đảo ngược để có thứ tự từ start đến goal
 
-    return path, expanded_nodes
+    return path, expanded_nodes, frontier_peak, len(visited)
 
 @measure_performance
 def dfs(maze, start, goal):
     stack = [start]  # Khởi tạo ngăn xếp với node bắt đầu
     visited = {start: None}  # Dictionary lưu node cha và node hiện tại
     expanded_nodes = 0  # Biến đếm số node đã mở rộng
+    frontier_peak = 1
 
     while stack:
         current = stack.pop()  # Lấy node cuối cùng (LIFO)
+        # trace: expand(current)
         expanded_nodes += 1  # Tăng số node đã duyệt
 
         if current == goal:
@@ -66,7 +154,7 @@ def dfs(maze, start, goal):
                 path.append(current)
                 current = visited[current]
             path.reverse()  # Đảo ngược để có đường đi từ start đến goal
-            return path, expanded_nodes
+            return path, expanded_nodes, frontier_peak, len(visited)
 
         # Đảo ngược thứ tự neighbors để duyệt theo thứ tự chuẩn
         neighbors = maze.get_neighbors(current)
@@ -74,30 +162,44 @@ def dfs(maze, start, goal):
 
         for neighbor in neighbors:
             if neighbor not in visited:
+                # trace: discover(neighbor)
                 visited[neighbor] = current  # Đánh dấu node cha
                 stack.append(neighbor)  # Thêm vào stack
+        if len(stack) > frontier_peak:
+            frontier_peak = len(stack)
 
-    return [], expanded_nodes  # Trả về đường đi rỗng nếu không tìm thấy
+    return [], expanded_nodes, frontier_peak, len(visited)  # Trả về đường đi rỗng nếu không tìm thấy
 
 @measure_performance
 def ucs(maze, start, goal):
-    heap = []
-    heapq.heappush(heap, (0, start))  # Hàng đợi ưu tiên (chi phí, node)
+    frontier = make_frontier(maze)  # Hàng đợi ưu tiên theo chi phí
+    frontier.push(0, start)
     visited = {start: (None, 0)}  # Lưu (node cha, chi phí tích lũy)
+    closed = set()  # Các node đã mở rộng xong
     expanded_nodes = 0
+    frontier_peak = 1
 
-    while heap:
-        current_cost, current = heapq.heappop(heap)  # Lấy node có chi phí nhỏ nhất
+    while frontier:
+        current_cost, current = frontier.pop()  # Lấy node có chi phí nhỏ nhất
+        if current in closed:
+            continue  # Bản ghi cũ trong heap (lazy deletion), node đã mở rộng rồi
+        closed.add(current)
+        # trace: expand(current)
         expanded_nodes += 1
 
         if current == goal:
             break  # Dừng khi tìm thấy đích
 
         for neighbor in maze.get_neighbors(current):
-            new_cost = current_cost + 1  # Giả định chi phí mỗi bước là 1
+            if neighbor in closed:
+                continue
+            new_cost = current_cost + maze.step_cost(neighbor)  # Chi phí đi vào ô kề
             if neighbor not in visited or new_cost < visited[neighbor][1]:
+                # trace: discover(neighbor)
                 visited[neighbor] = (current, new_cost)
-                heapq.heappush(heap, (new_cost, neighbor))  # Thêm vào hàng đợi ưu tiên
+                frontier.push(new_cost, neighbor)  # Thêm vào hàng đợi ưu tiên
+        if len(frontier) > frontier_peak:
+            frontier_peak = len(frontier)
 
     # Truy vết đường đi
     path = []
@@ -108,7 +210,7 @@ def ucs(maze, start, goal):
             current = visited[current][0]  # Lấy node cha
         path.reverse()
 
-    return path, expanded_nodes
+    return path, expanded_nodes, frontier_peak, len(visited)
 
 def heuristic(a, b):
     """Heuristic function using Manhattan distance"""
@@ -116,25 +218,41 @@ def heuristic(a, b):
 @measure_performance
 def a_star(maze, start, goal):
     """A* Search Algorithm"""
-    heap = []
-    heapq.heappush(heap, (0, start))  # (cost, node)
+    bound = maze.distance_bound(maze.index(goal))  # ALT / exact-table bound when precomputed
+    scale = maze.min_step_cost  # Mỗi bước tốn ít nhất chừng này, nên h nhân lên vẫn chấp nhận được
+    frontier = make_frontier(maze)  # Theo f; cùng f thì ưu tiên h nhỏ (gần goal hơn)
+    frontier.push(scale * (heuristic(start, goal) if bound is None else max(bound(maze.index(start)), 0)), start)
     visited = {start: (None, 0)}  # {node: (previous_node, g_cost)}
+    closed = set()  # Các node đã mở rộng xong
     expanded_nodes = 0
+    frontier_peak = 1
     
-    while heap:
-        current_cost, current = heapq.heappop(heap)
+    while frontier:
+        _, current = frontier.pop()
+        if current in closed:
+            continue  # Bản ghi cũ trong heap (lazy deletion), node đã mở rộng rồi
+        closed.add(current)
+        # trace: expand(current)
         expanded_nodes += 1
         
         if current == goal:
             break
         
+        current_cost = visited[current][1]
         for neighbor in maze.get_neighbors(current):
-            new_cost = visited[current][1] + 1  # g(n) = g(current) + 1
-            f_cost = new_cost + heuristic(neighbor, goal)  # f(n) = g(n) + h(n)
-            
+            if neighbor in closed:
+                continue
+            new_cost = current_cost + maze.step_cost(neighbor)  # g(n) = g(current) + chi phí ô n
             if neighbor not in visited or new_cost < visited[neighbor][1]:
+                h = heuristic(neighbor, goal) if bound is None else bound(maze.index(neighbor))
+                if h < 0:
+                    continue  # Không thể tới goal từ ô này
+                h *= scale
+                # trace: discover(neighbor)
                 visited[neighbor] = (current, new_cost)
-                heapq.heappush(heap, (f_cost, neighbor))
+                frontier.push(new_cost + h, neighbor, h)  # f(n) = g(n) + h(n)
+        if len(frontier) > frontier_peak:
+            frontier_peak = len(frontier)
     
     path = []
     if goal in visited:
@@ -144,4 +262,309 @@ def a_star(maze, start, goal):
             current = visited[current][0]
         path.reverse()
     
-    return path, expanded_nodes
+    return path, expanded_nodes, frontier_peak, len(visited)
+
+
+INF = float("inf")
+
+
+class DStarLite:
+    """Incremental planner (Moving-Target D* Lite) that keeps its search tree between calls.
+
+    The tree is rooted at the searcher (start) and grows towards the goal, so
+    g[s] is the distance from the root to cell s plus a constant offset. A goal
+    move only raises the key offset km (the heuristic points at the goal). A
+    start move makes the new start the root: cells whose parent chain no longer
+    leads to it are deleted and refilled from their neighbors, while the
+    subtree below the new start keeps its g values (they all share the old
+    root's offset). Temporarily blocked cells (e.g. other ghosts) are
+    edge-cost changes on their neighbors. Nodes are flat cell indices.
+    """
+
+    def __init__(self, maze, start, goal):
+        self.reset(maze, start, goal)
+
+    def reset(self, maze, start, goal):
+        """Drop the search tree and start over on (maze, start, goal)"""
+        self.maze = maze
+        self.maze_key = maze.cache_key()
+        self.mask, self.steps = maze.neighbor_mask, maze.mask_offsets
+        size = len(self.mask)
+        self.g = [INF] * size
+        self.rhs = [INF] * size
+        self.parent = [-1] * size  # Neighbor rhs comes from; -1 outside the tree and at the root
+        self.tree = set()  # Cells with a finite rhs
+        self.blocked = bytearray(size)
+        self.blocked_cells = set()
+        self.heap = []
+        self.open = {}  # node -> key it is queued with; stale heap entries are skipped
+        self.km = 0
+        self.visited_count = 0  # Cells with a finite g value
+        self.start = maze.index(start)
+        self.goal = maze.index(goal)
+        self.rhs[self.start] = 0
+        self.tree.add(self.start)
+        self._push(self.start)
+
+    def _h(self, a, b):
+        ax, ay = divmod(a, self.maze.height)
+        bx, by = divmod(b, self.maze.height)
+        return abs(ax - bx) + abs(ay - by)
+
+    def _key(self, s):
+        best = min(self.g[s], self.rhs[s])
+        return (best + self._h(s, self.goal) + self.km, best)
+
+    def _push(self, s):
+        key = self._key(s)
+        self.open[s] = key
+        heapq.heappush(self.heap, (key, s))
+
+    def _top(self):
+        heap, open_ = self.heap, self.open
+        while heap and open_.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _update_vertex(self, u):
+        if u != self.start:
+            best, best_parent = INF, -1
+            if not self.blocked[u]:
+                g, blocked = self.g, self.blocked
+                for step in self.steps[self.mask[u]]:
+                    v = u + step
+                    if not blocked[v] and g[v] + 1 < best:
+                        best, best_parent = g[v] + 1, v
+            self.rhs[u] = best
+            self.parent[u] = best_parent
+            if best == INF:
+                self.tree.discard(u)
+            else:
+                self.tree.add(u)
+        self.open.pop(u, None)
+        if self.g[u] != self.rhs[u]:
+            self._push(u)
+
+    def _neighbors(self, u):
+        return [u + step for step in self.steps[self.mask[u]]]
+
+    def move_start(self, start):
+        """Re-root the tree at `start`; False if start is outside the tree (the caller resets)"""
+        start = self.maze.index(start)
+        if start == self.start:
+            return True
+        if self.g[start] == INF:
+            return False
+        g, rhs, parent, open_ = self.g, self.rhs, self.parent, self.open
+        self.start = start
+        parent[start] = -1
+        rhs[start] = g[start]  # The root keeps its g: the whole subtree shares that offset
+
+        # Cells whose parent chain reaches the new root stay; the rest of the tree is deleted
+        kept = {start: True}
+        for cell in self.tree:
+            chain = []
+            current = cell
+            while current not in kept:
+                kept[current] = False  # Provisional, also breaks parent cycles
+                chain.append(current)
+                current = parent[current]
+                if current == -1:
+                    break
+            verdict = current != -1 and kept[current]
+            for link in chain:
+                kept[link] = verdict
+        deleted = [cell for cell, keep in kept.items() if not keep]
+        for cell in deleted:
+            if g[cell] != INF:
+                self.visited_count -= 1
+            g[cell] = rhs[cell] = INF
+            parent[cell] = -1
+            open_.pop(cell, None)
+            self.tree.discard(cell)
+        for cell in deleted:
+            self._update_vertex(cell)
+        return True
+
+    def move_goal(self, goal):
+        """The tree does not depend on the goal: only the key offset grows"""
+        goal = self.maze.index(goal)
+        if goal != self.goal:
+            self.km += self._h(self.goal, goal)
+            self.goal = goal
+
+    def set_blocked(self, cells):
+        """Make `cells` the current set of temporarily blocked positions"""
+        cells = {self.maze.index(cell) for cell in cells}
+        changed = cells ^ self.blocked_cells
+        for cell in changed:
+            self.blocked[cell] = cell in cells
+        self.blocked_cells = cells
+        for cell in changed:
+            self._update_vertex(cell)
+            for neighbor in self._neighbors(cell):
+                self._update_vertex(neighbor)
+
+    def compute(self):
+        """Repair the tree until goal is consistent; returns (expanded_nodes, frontier_peak)"""
+        g, rhs, goal = self.g, self.rhs, self.goal
+        expanded_nodes = 0
+        frontier_peak = len(self.heap)
+        while True:
+            top = self._top()
+            if top is None:
+                break
+            goal_key = self._key(goal)
+            if not (top[0] < goal_key or rhs[goal] != g[goal]):
+                break
+            key_old, u = heapq.heappop(self.heap)
+            del self.open[u]
+            expanded_nodes += 1
+            key_new = self._key(u)
+            if key_old < key_new:
+                self._push(u)
+            elif g[u] > rhs[u]:
+                if g[u] == INF:
+                    self.visited_count += 1
+                g[u] = rhs[u]
+                for s in self._neighbors(u):
+                    self._update_vertex(s)
+            else:
+                if g[u] != INF:
+                    self.visited_count -= 1
+                g[u] = INF
+                for s in self._neighbors(u):
+                    self._update_vertex(s)
+                self._update_vertex(u)
+            if len(self.heap) > frontier_peak:
+                frontier_peak = len(self.heap)
+        return expanded_nodes, frontier_peak
+
+    def path(self):
+        """Greedy descent on g from goal back to the root, reversed (start excluded)"""
+        g, blocked, maze = self.g, self.blocked, self.maze
+        current = self.goal
+        if g[current] == INF:
+            return []
+        path = []
+        while current != self.start and len(path) < len(g):
+            path.append(maze.position(current))
+            best, best_cost = None, g[current]
+            for neighbor in self._neighbors(current):
+                if not blocked[neighbor] and g[neighbor] < best_cost:
+                    best, best_cost = neighbor, g[neighbor]
+            if best is None:
+                return []
+            current = best
+        path.reverse()
+        return path
+
+    def plan(self, maze, start, goal, blocked=()):
+        """Bring the tree up to date with the new state and return its path"""
+        if maze is not self.maze or maze.cache_key() != self.maze_key or not self.move_start(start):
+            self.reset(maze, start, goal)
+        else:
+            self.move_goal(goal)
+        self.set_blocked(blocked)
+        expanded_nodes, frontier_peak = self.compute()
+        return self.path(), expanded_nodes, frontier_peak, self.visited_count
+
+
+@measure_performance
+def d_star_lite(maze, start, goal, planner, blocked=()):
+    """Incremental search reusing `planner`'s tree from the previous call"""
+    return planner.plan(maze, start, goal, blocked)
+
+
+class PathCache:
+    """Bounded LRU cache of search results keyed on (maze.cache_key(), search, start, goal).
+
+    For shortest-path searches a query whose start lies on a cached path to the
+    same goal is answered with that path's suffix. Hits are recorded in the
+    profiler with cached=True and zero expanded nodes.
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.entries = OrderedDict()  # key -> path tuple, exactly as the search returned it
+        self.by_goal = {}  # (maze_key, search, goal) -> {key: {position: steps from the entry's start}}
+        self.hits = self.suffix_hits = self.misses = 0
+
+    def search(self, search, maze, start, goal):
+        """Same contract as a decorated search: (path, expanded_nodes, search_time, memory_kb)"""
+        maze_key = maze.cache_key() if self.capacity > 0 else None
+        if maze_key is None:
+            return search(maze, start, goal)
+
+        start_ns = perf_counter_ns()
+        path = self._lookup(maze_key, search, start, goal)
+        if path is None:
+            self.misses += 1
+            result = search(maze, start, goal)
+            self._store(maze_key, search, start, goal, result[0])
+            return result
+
+        wall_ns = perf_counter_ns() - start_ns
+        if profiler.mode != OFF:
+            profiler.records.append(SearchRecord(search.__name__, 0, 0, 0, wall_ns, 0.0, len(path), True))
+        return path, 0, wall_ns / 1e9, 0.0
+
+    def _lookup(self, maze_key, search, start, goal):
+        key = (maze_key, search, start, goal)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return list(self.entries[key])
+        if search not in SHORTEST_PATH_SEARCHES:
+            return None
+        for entry_key, positions in self.by_goal.get((maze_key, search, goal), {}).items():
+            index = positions.get(start)
+            if index is not None:
+                self.entries.move_to_end(entry_key)
+                self.suffix_hits += 1
+                return list(self.entries[entry_key][index:])
+        return None
+
+    def _store(self, maze_key, search, start, goal, path):
+        key = (maze_key, search, start, goal)
+        self.entries[key] = tuple(path)
+        if path and search in SHORTEST_PATH_SEARCHES:
+            # Shortest-path results leave out start, so position p_i is i + 1 steps away
+            positions = {position: index + 1 for index, position in enumerate(path)}
+            positions[start] = 0
+            self.by_goal.setdefault((maze_key, search, goal), {})[key] = positions
+        while len(self.entries) > self.capacity:
+            old_key, _ = self.entries.popitem(last=False)
+            bucket = self.by_goal.get(old_key[:2] + old_key[3:])
+            if bucket is not None:
+                bucket.pop(old_key, None)
+                if not bucket:
+                    del self.by_goal[old_key[:2] + old_key[3:]]
+
+    def stats(self):
+        lookups = self.hits + self.suffix_hits + self.misses
+        return {
+            "hits": self.hits,
+            "suffix_hits": self.suffix_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.suffix_hits) / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.by_goal.clear()
+        self.hits = self.suffix_hits = self.misses = 0
+
+
+ALGORITHMS = {
+    "BFS": bfs,
+    "DFS": dfs,
+    "UCS": ucs,
+    "Astar": a_star,
+}
+
+# Searches that always return a shortest path, so any suffix of a result is one too
+SHORTEST_PATH_SEARCHES = {bfs, ucs, a_star}
+
+path_cache = PathCache(PATH_CACHE_SIZE)
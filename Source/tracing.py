@@ -0,0 +1,138 @@
+# Source\tracing.py
+"""Opt-in expansion/frontier tracing for the searches.
+
+The searches carry `# trace: expand(current)` / `# trace: discover(neighbor)`
+comment lines just above the statements where a node is expanded or first
+enters the frontier. The normal functions ignore them, so tracing costs nothing
+when it is off. run_traced() compiles a second copy of the search module in
+which every marker becomes a call on the active SearchTrace, and runs the
+search from it. A marker that is not on its own line, names an unknown call,
+or is missing from a function that counts expanded_nodes raises ValueError
+instead of silently leaving the trace incomplete.
+"""
+from array import array
+import ast
+import inspect
+import re
+import sys
+import numpy as np
+
+MARKER = re.compile(r"^(\s*)#\s*trace:\s*((\w+)\(.*\))\s*$")
+ANY_MARKER = re.compile(r"#\s*trace\b")  # Anything that looks like a marker, well-formed or not
+EXPAND_CALLS = {"expand", "expand_all"}
+
+_namespaces = {}  # module name -> namespace of its traced functions
+
+
+class SearchTrace:
+    """Expansion order and frontier growth of one search, as compact int32 arrays
+
+    expanded[k] is the k-th expanded cell, discovered lists cells in the order
+    they first entered the frontier, and discovered_at[k] is len(discovered)
+    when expansion k happened, so the frontier at any step can be rebuilt.
+    """
+
+    def __init__(self, maze):
+        self.maze = maze
+        self.expanded = array("i")
+        self.discovered = array("i")
+        self.discovered_at = array("i")
+        self.seen = bytearray(maze.width * maze.height)
+
+    def _cell(self, node):
+        return self.maze.index(node) if type(node) is tuple else node
+
+    def expand(self, node):
+        self.expanded.append(self._cell(node))
+        self.discovered_at.append(len(self.discovered))
+
+    def expand_all(self, nodes):
+        for node in nodes:
+            self.expand(node)
+
+    def discover(self, node):
+        cell = self._cell(node)
+        if not self.seen[cell]:
+            self.seen[cell] = 1
+            self.discovered.append(cell)
+
+    def frontier_at(self, step):
+        """Cells discovered but not yet expanded just before expansion `step`"""
+        step = min(step, len(self.expanded))
+        count = self.discovered_at[step] if step < len(self.discovered_at) else len(self.discovered)
+        return set(self.discovered[:count]) - set(self.expanded[:step])
+
+    def heatmap(self):
+        """(width, height) float array: expansion rank in 0..1, -1 for frontier-only cells, nan elsewhere"""
+        maze = self.maze
+        rank = np.full(maze.width * maze.height, np.nan)
+        rank[np.frombuffer(self.discovered, dtype=np.int32)] = -1.0
+        order = np.frombuffer(self.expanded, dtype=np.int32)
+        if order.size:
+            rank[order] = np.arange(order.size) / max(order.size - 1, 1)
+        return rank.reshape(maze.width, maze.height)
+
+
+def _counts_expansions(function):
+    """True if `function` itself assigns expanded_nodes (nested functions excluded)"""
+    nodes = list(function.body)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            continue
+        targets = (node.targets if isinstance(node, ast.Assign)
+                   else [node.target] if isinstance(node, (ast.AugAssign, ast.AnnAssign)) else ())
+        if any(isinstance(target, ast.Name) and target.id == "expanded_nodes" for target in targets):
+            return True
+        nodes.extend(ast.iter_child_nodes(node))
+    return False
+
+
+def _traced_namespace(module):
+    """Namespace holding a traced copy of every function defined in `module`"""
+    namespace = _namespaces.get(module.__name__)
+    if namespace is not None:
+        return namespace
+
+    source = inspect.getsource(module).splitlines()
+    markers = {}  # line number -> call name
+    lines = []
+    for number, line in enumerate(source, 1):
+        lines.append(line)
+        if not ANY_MARKER.search(line):
+            continue
+        match = MARKER.match(line)
+        if match is None:
+            raise ValueError(f"{module.__name__}:{number}: trace marker must be a comment line of its own: {line.strip()}")
+        if not callable(getattr(SearchTrace, match.group(3), None)):
+            raise ValueError(f"{module.__name__}:{number}: unknown trace call {match.group(2)}")
+        markers[number] = match.group(3)
+        lines.append(f"{match.group(1)}_trace.{match.group(2)}")
+
+    # Only the functions: re-running the module body would re-register searches
+    functions = [node for node in ast.parse("\n".join(source)).body if isinstance(node, ast.FunctionDef)]
+    for function in functions:
+        calls = {call for number, call in markers.items() if function.lineno <= number <= function.end_lineno}
+        if _counts_expansions(function) and not calls & EXPAND_CALLS:
+            raise ValueError(f"{module.__name__}.{function.name} counts expanded_nodes but has no expand trace marker")
+    tree = ast.parse("\n".join(lines))
+    tree.body = [node for node in tree.body if isinstance(node, ast.FunctionDef)]
+
+    namespace = dict(vars(module))
+    namespace["_trace"] = None
+    exec(compile(tree, f"<traced {module.__name__}>", "exec"), namespace)
+    _namespaces[module.__name__] = namespace
+    return namespace
+
+
+def run_traced(search, maze, start, goal):
+    """Run a decorated search from its traced copy; returns (search result, SearchTrace)"""
+    namespace = _traced_namespace(sys.modules[search.__module__])
+    trace = SearchTrace(maze)
+    trace.discover(start)
+    namespace["_trace"] = trace
+    try:
+        result = namespace[search.__name__](maze, start, goal)
+    finally:
+        namespace["_trace"] = None
+    return result, trace